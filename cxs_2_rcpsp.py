@@ -34,11 +34,18 @@ An object of the class `Network` represents a network of activities with the (du
 An object of class `Node` represents a node with an index and attributes earliest start time (est), latest start time (lst), earliest finish time (eft), latest finish time (eft), and start time (start). Furthermore, every node has a set of successors and a processing time.
 
 Note that the data structures slightly changed compared to assignment 1! (E.g., a `Node` object now has an additional attribute `resource_requirements`, which stores the resource demand for every resource (in a dictonary)).
+
+For the solvers, `Network.compile()` returns a `CompiledNetwork`, which stores the same data in NumPy arrays (processing times, a $V \times K$ demand matrix, the time windows, and the successors / predecessors in CSR format). `CompiledNetwork.to_network()` converts it back.
 """
 
 # data structures
+import numpy as np
+
 class Node:
 
+    __slots__ = ('id', 'successors', 'processing_time', 'resource_requirements',
+                 'est', 'lst', 'eft', 'lft', 'start')
+
     def __init__(self, index, successors, processing_time, resource_requirements):
         self.id=index
         self.successors=successors
@@ -66,14 +73,114 @@ class Network:
         self.arcs=arcs                  # dict of timelags (i,j): d_ij
         self.Tmax=sum([n.processing_time for n in self.node_dict.values()])+1
         self.makespan=None
+        self.result=None                # Result of the last solve() run
         # additional attributes for RCPSP
         self.number_of_resources = k
         self.resource_availability = C  # dict of resource availabilities
+        # successor / predecessor lists of every node, kept in sync by add_arc() and remove_arc()
+        self.successor_index, self.predecessor_index = self.build_arc_index()
+
+
+    def build_arc_index(self):
+        successor_index = [[] for i in self.node_ids]
+        predecessor_index = [[] for i in self.node_ids]
+        for (i, j) in self.arcs:
+            successor_index[i].append(j)
+            predecessor_index[j].append(i)
+        return successor_index, predecessor_index
+
+
+    def add_arc(self, i, j, d_ij):
+        if (i, j) not in self.arcs:
+            self.successor_index[i].append(j)
+            self.predecessor_index[j].append(i)
+            if j not in self.node_dict[i].successors:
+                self.node_dict[i].successors.append(j)
+        self.arcs[(i, j)] = d_ij
+
+
+    def remove_arc(self, i, j):
+        del self.arcs[(i, j)]
+        self.successor_index[i].remove(j)
+        self.predecessor_index[j].remove(i)
+        if j in self.node_dict[i].successors:
+            self.node_dict[i].successors.remove(j)
 
 
     def __str__(self):
         return '{}: A network with {}+2 nodes, {} arcs, and deadline {}.'.format(self.name, len(self.node_ids)-2, len(self.arcs), self.Tmax)
 
+
+    def compile(self):
+        return CompiledNetwork(self)
+
+
+
+class CompiledNetwork:
+    # array-backed copy of a Network for the solvers: processing times p (V), demand matrix r (V x K),
+    # availabilities R (K), time windows est/lst/eft/lft (V, None before compute_time_windows())
+    # and the arcs in CSR form, e.g. the successors of i are succ_indices[succ_indptr[i]:succ_indptr[i+1]]
+
+    def __init__(self, network):
+        V = len(network.node_ids)
+        K = len(network.resource_availability)
+        nodes = [network.node_dict[i] for i in range(0, V)]
+        self.name = network.name
+        self.Tmax = network.Tmax
+        self.p = np.array([n.processing_time for n in nodes], dtype=int)
+        self.r = np.array([[n.resource_requirements[k] for k in range(0, K)] for n in nodes], dtype=float).reshape(V, K)
+        self.R = np.array([network.resource_availability[k] for k in range(0, K)], dtype=float)
+        for attr in ('est', 'lst', 'eft', 'lft'):
+            values = [getattr(n, attr) for n in nodes]
+            setattr(self, attr, None if None in values else np.array(values, dtype=int))
+        arcs = np.array(list(network.arcs.keys()), dtype=int).reshape(-1, 2)
+        lags = np.array(list(network.arcs.values()), dtype=int)
+        self.succ_indptr, self.succ_indices, self.succ_lags = self.csr(arcs[:, 0], arcs[:, 1], lags, V)
+        self.pred_indptr, self.pred_indices, self.pred_lags = self.csr(arcs[:, 1], arcs[:, 0], lags, V)
+
+
+    @classmethod
+    def from_arrays(cls, name, Tmax, p, r, R, est, lst, eft, lft, succ_indptr, succ_indices, succ_lags):
+        # e.g. for the arrays of the instance cache, the predecessor CSR arrays are derived from the successors
+        self = cls.__new__(cls)
+        self.name = name
+        self.Tmax = Tmax
+        self.p, self.r, self.R = p, r, R
+        self.est, self.lst, self.eft, self.lft = est, lst, eft, lft
+        self.succ_indptr, self.succ_indices, self.succ_lags = succ_indptr, succ_indices, succ_lags
+        tails, heads = self.arcs
+        self.pred_indptr, self.pred_indices, self.pred_lags = self.csr(heads, tails, succ_lags, len(p))
+        return self
+
+
+    @staticmethod
+    def csr(tails, heads, lags, V):
+        order = np.argsort(tails, kind='stable')
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(tails, minlength=V))))
+        return indptr, heads[order], lags[order]
+
+
+    @property
+    def arcs(self):
+        # arcs (i, j) as two arrays, in CSR order
+        return np.repeat(np.arange(len(self.p)), np.diff(self.succ_indptr)), self.succ_indices
+
+
+    def to_network(self):
+        V, K = self.r.shape
+        tails, heads = self.arcs
+        node_dict = {}
+        for i in range(0, V):
+            node_dict[i] = Node(index=i, successors=self.succ_indices[self.succ_indptr[i]:self.succ_indptr[i+1]].tolist(),
+                                processing_time=int(self.p[i]), resource_requirements=[int(v) for v in self.r[i]])
+            for attr in ('est', 'lst', 'eft', 'lft'):
+                if getattr(self, attr) is not None:
+                    setattr(node_dict[i], attr, int(getattr(self, attr)[i]))
+        arcs = {(int(i), int(j)): int(d) for i, j, d in zip(tails, heads, self.succ_lags)}
+        network = Network(self.name, node_dict, arcs, K, {k: int(self.R[k]) for k in range(0, K)})
+        network.Tmax = self.Tmax
+        return network
+
 """### Gurobi Setup
 
 As in assignment 1, make sure to install Gurobi and create an environment with your WLS license.
@@ -88,7 +195,6 @@ drive.mount('/content/drive')
 
 import gurobipy as gp
 from gurobipy import GRB
-from copy import deepcopy
 
 # 1 Read license from file
 
@@ -118,79 +224,772 @@ Please choose one of the three options to reduce the time window size, and compl
 (You can simply copy-paste your code from Assignment 1!)
 """
 
-def compute_time_windows(network):
-
-  def lca(network):
-    # init
-    d = [0] + [float('-inf') for n in network.node_ids[1:]] # list for distances
-    p = [0] + [-1 for n in network.node_ids[1:]]            # list for predecessors
-    q = [0]                                              # queue
-
-    #main
-    while len(q) > 0:
-      i = q.pop(0)
-      for j in network.node_dict[i].successors:
-        #print(network.arcs)
-        #print(network.node_dict[0].successors)
-        #print(network.arcs)
-        #print(j, i)
-        #print(network.node_dict[i].successors)
-        #print(j, i, d[j], d[i], network.arcs[(i, j)])
-        if d[j] < d[i] + network.arcs[(i, j)]:
-          d[j] = d[i] + network.arcs[(i, j)]
-          p[j] = i
-          if d[j] > ((len(network.node_ids)-1) * max(network.arcs.values())):
-            return "Positive Cycles, algorithm stopped."
-          if j not in q:
-            q.append(j)
-    return d, p, q
-
-  def create_auxiliary_network(network):
-
-    auxiliary_network = Network(network.name, deepcopy(network.node_dict), deepcopy(network.arcs), network.number_of_resources, network.resource_availability)
-    auxiliary_network.arcs[((len(auxiliary_network.node_ids) - 1), 0)] = -network.Tmax
-    # print(auxiliary_network.arcs)
-    # print(len(network.node_ids))
-    keys = list(auxiliary_network.arcs.keys())
-    # print(network.arcs.keys())
-    values = list(auxiliary_network.arcs.values())
-    # print(network.arcs.values())
-    tuple_rev = [(sub[1], sub[0]) for sub in keys]
-    # print(tuple_rev)
-    arc_rev = {tuple_rev[i]: values[i] for i in range(0, len(auxiliary_network.arcs))}
-    # print(arc_rev)
-    auxiliary_network.arcs = arc_rev
-    # successors have to be corrected
-    #print(auxiliary_network.node_dict[0])
-    for n in auxiliary_network.node_ids:
-      auxiliary_network.node_dict[n].successors =[i for i in auxiliary_network.node_ids if (n,i) in auxiliary_network.arcs]
-    #print(auxiliary_network.node_dict[4].successors
-    #print(network.node_dict)
-    #print(auxiliary_network.node_dict)
-    # print(auxiliary_network.arcs)
-    return auxiliary_network
-
-
-  # calculateing EST / LST
-  d, p, q = lca(network)
-  #print(d)
+from collections import deque
+
+def longest_paths(n, neighbors, weight, labels, mode='auto'):
+  # longest path labels from the initially labeled nodes along the arcs (i, j), j in neighbors[i], of length weight(i, j)
+  # mode 'topological' (acyclic networks, one pass in topological order),
+  # 'label_correcting' (general time lags, FIFO queue) or 'auto'
+
+  if mode in ('auto', 'topological'):
+    indegree = [0] * n
+    for i in range(0, n):
+      for j in neighbors[i]:
+        indegree[j] += 1
+    order = [i for i in range(0, n) if indegree[i] == 0]
+    for i in order:
+      for j in neighbors[i]:
+        indegree[j] -= 1
+        if indegree[j] == 0:
+          order.append(j)
+    if len(order) == n:
+      d = list(labels)
+      p = [-1] * n
+      for i in order:
+        if d[i] == float('-inf'):
+          continue
+        for j in neighbors[i]:
+          if d[j] < d[i] + weight(i, j):
+            d[j] = d[i] + weight(i, j)
+            p[j] = i
+      return d, p
+    if mode == 'topological':
+      raise ValueError('Network contains a cycle, use the label correcting mode.')
+
+  # label correcting algorithm with FIFO queue
+  d = list(labels)
+  p = [-1] * n
+  q = deque(i for i in range(0, n) if d[i] != float('-inf'))
+  in_queue = [False] * n
+  for i in q:
+    in_queue[i] = True
+  updates = [0] * n # number of times a node was queued
+  while q:
+    i = q.popleft()
+    in_queue[i] = False
+    for j in neighbors[i]:
+      if d[j] < d[i] + weight(i, j):
+        d[j] = d[i] + weight(i, j)
+        p[j] = i
+        if not in_queue[j]:
+          # without positive cycles a node enters the queue at most n-1 times
+          updates[j] += 1
+          if updates[j] > n:
+            raise ValueError('Positive cycle through node {}, algorithm stopped.'.format(j))
+          q.append(j)
+          in_queue[j] = True
+  return d, p
+
+
+def compute_time_windows(network, mode='auto'):
+
+  n = len(network.node_ids)
+  arcs = network.arcs
+
+  # calculateing EST / EFT: longest paths from S_0 = 0 along the successors
+  labels = [0] + [float('-inf') for i in network.node_ids[1:]]
+  d, p = longest_paths(n, network.successor_index, lambda i, j: arcs[(i, j)], labels, mode)
   for k, v in network.node_dict.items():
     v.est = d[k]
     v.eft = d[k] + network.node_dict[k].processing_time
 
-  auxiliary_network = create_auxiliary_network(network)
-  s, t, u = lca(auxiliary_network)
-  #print(auxiliary_network.node_dict[2].est)
-  #print(d)
+  # calculateing LST / LFT: longest paths along the predecessors from S_0 = 0 and S_n = Tmax, lst_i = -s_i
+  labels[-1] = -network.Tmax
+  s, t = longest_paths(n, network.predecessor_index, lambda j, i: arcs[(i, j)], labels, mode)
   for k, v in network.node_dict.items():
-    #print(d)
     v.lst = -s[k]
     v.lft = v.lst + network.node_dict[k].processing_time
-    #print(network.node_dict[k].lst)
-    #print(network.node_dict[k].lft)
 
   return
 
+"""### Heuristic Upper Bound
+
+The horizon $T^{max}=\sum_i p_i + 1$ determines the number of time-indexed variables (and the big-M of the flow model). A feasible schedule gives a much smaller horizon: `serial_sgs()` and `parallel_sgs()` implement the serial and the parallel *schedule generation scheme*, which schedule the activities in the order of a priority rule (`PRIORITY_RULES`, smaller values first). `set_heuristic_horizon()` runs all rules with both schemes, sets $T^{max}$ to the best makespan $+1$ and recomputes the time windows against this deadline.
+"""
+
+def topological_order(network):
+  V = len(network.node_ids)
+  indegree = [len(network.predecessor_index[i]) for i in range(0, V)]
+  order = [i for i in range(0, V) if indegree[i] == 0]
+  for i in order:
+    for j in network.successor_index[i]:
+      indegree[j] -= 1
+      if indegree[j] == 0:
+        order.append(j)
+  return order
+
+
+def transitive_closure(network):
+  # bit set of the (transitive) successors of every node, computed in reverse topological order
+  V = len(network.node_ids)
+  reach = [0] * V
+  for i in reversed(topological_order(network)):
+    for j in network.successor_index[i]:
+      reach[i] |= reach[j] | (1 << j)
+  return reach
+
+
+def total_successors(network):
+  # number of (transitive) successors of every node
+  return [bin(b).count('1') for b in transitive_closure(network)]
+
+
+# priority value of activity i (smaller values first), n_succ = number of total successors
+PRIORITY_RULES = {
+  'LFT': lambda network, i, n_succ: network.node_dict[i].lft,             # latest finish time
+  'LST': lambda network, i, n_succ: network.node_dict[i].lst,             # latest start time
+  'MTS': lambda network, i, n_succ: -n_succ[i],                           # most total successors
+  'MIS': lambda network, i, n_succ: -len(network.successor_index[i]),     # most immediate successors
+  'GRPW': lambda network, i, n_succ: -(network.node_dict[i].processing_time # greatest rank positional weight
+                                       + sum(network.node_dict[j].processing_time for j in network.successor_index[i])),
+  'SPT': lambda network, i, n_succ: network.node_dict[i].processing_time, # shortest processing time
+  'LPT': lambda network, i, n_succ: -network.node_dict[i].processing_time, # longest processing time
+}
+
+
+def priority_values(network, rule):
+  if network.node_dict[0].lft is None:
+    compute_time_windows(network)
+  n_succ = total_successors(network) if rule == 'MTS' else None
+  # ties are broken by the smaller activity index
+  return [(PRIORITY_RULES[rule](network, i, n_succ), i) for i in network.node_ids]
+
+
+def sgs_data(network):
+  V = len(network.node_ids)
+  K = len(network.resource_availability)
+  p = [network.node_dict[i].processing_time for i in range(0, V)]
+  r = np.array([[network.node_dict[i].resource_requirements[k] for k in range(0, K)] for i in range(0, V)], dtype=float).reshape(V, K)
+  R = np.array([network.resource_availability[k] for k in range(0, K)], dtype=float)
+  if np.any(r > R):
+    raise ValueError('{}: an activity requires more than the available capacity.'.format(network.name))
+  usage = np.zeros((sum(p) + max(network.arcs.values(), default=0) + 1, K))
+  return V, p, r, R, usage
+
+
+def select_activity(eligible, priority, rng=None):
+  if rng is None or len(eligible) == 1:
+    return min(eligible, key=lambda i: priority[i])
+  # regret based biased random sampling: the better the priority value, the higher the probability
+  worst = max(priority[i][0] for i in eligible)
+  return rng.choices(eligible, weights=[worst - priority[i][0] + 1 for i in eligible])[0]
+
+
+def serial_sgs(network, priority, rng=None):
+  # schedule one activity per stage at its earliest precedence and resource feasible start
+  V, p, r, R, usage = sgs_data(network)
+  start = [None] * V
+  missing = [len(network.predecessor_index[j]) for j in range(0, V)]
+  eligible = [j for j in range(0, V) if missing[j] == 0]
+  for stage in range(0, V):
+    j = select_activity(eligible, priority, rng)
+    eligible.remove(j)
+    t = max([start[i] + network.arcs[(i, j)] for i in network.predecessor_index[j]], default=0)
+    while np.any(usage[t:t+p[j]] + r[j] > R):
+      t += 1
+    start[j] = t
+    usage[t:t+p[j]] += r[j]
+    for k in network.successor_index[j]:
+      missing[k] -= 1
+      if missing[k] == 0:
+        eligible.append(k)
+  return start
+
+
+def parallel_sgs(network, priority, rng=None):
+  # advance the schedule time t and start as many eligible activities at t as the resources allow
+  V, p, r, R, usage = sgs_data(network)
+  start = [None] * V
+  scheduled = 0
+  t = 0
+  while scheduled < V:
+    progress = True
+    while progress: # activities started at t can release successors at t (zero time lags)
+      progress = False
+      eligible = [j for j in range(0, V) if start[j] is None
+                  and all(start[i] is not None and start[i] + network.arcs[(i, j)] <= t for i in network.predecessor_index[j])]
+      while eligible:
+        j = select_activity(eligible, priority, rng)
+        eligible.remove(j)
+        if not np.any(usage[t:t+p[j]] + r[j] > R):
+          start[j] = t
+          usage[t:t+p[j]] += r[j]
+          scheduled += 1
+          progress = True
+    # next decision point: next finish time or next release by a time lag
+    events = [start[i] + p[i] for i in range(0, V) if start[i] is not None and start[i] + p[i] > t]
+    events += [start[i] + network.arcs[(i, j)] for i in range(0, V) if start[i] is not None
+               for j in network.successor_index[i] if start[j] is None and start[i] + network.arcs[(i, j)] > t]
+    t = min(events, default=t+1)
+  return start
+
+
+def heuristic_upper_bound(network, rules=tuple(PRIORITY_RULES), schemes=('serial', 'parallel')):
+  # best schedule over all priority rules and schedule generation schemes
+  best = None
+  for rule in rules:
+    priority = priority_values(network, rule)
+    for scheme in schemes:
+      start = serial_sgs(network, priority) if scheme == 'serial' else parallel_sgs(network, priority)
+      makespan = start[len(network.node_ids)-1]
+      if best is None or makespan < best[0]:
+        best = (makespan, start, rule, scheme)
+  return best
+
+
+def set_heuristic_horizon(network, rules=tuple(PRIORITY_RULES), schemes=('serial', 'parallel'), passes=0, workers=None):
+  # passes > 0 additionally runs randomized passes, see multi_pass_heuristic() below
+  if passes > 0:
+    makespan, start = multi_pass_heuristic(network, passes, workers, rules, schemes)
+  else:
+    makespan, start, rule, scheme = heuristic_upper_bound(network, rules, schemes)
+  if makespan + 1 < network.Tmax:
+    network.Tmax = makespan + 1
+  compute_time_windows(network)
+  return makespan, start
+
+"""### Multi-Pass Heuristic and MIP Start
+
+A single pass per priority rule is fast, but many randomized passes (*regret based biased random sampling*, `select_activity()`) usually find better schedules. `multi_pass_heuristic()` distributes the passes over a process pool and keeps the best schedule. The schedule can then be passed to every `solve()` method as `mip_start`, where `set_mip_start()` loads it as incumbent (`Start` attributes) before the optimization.
+"""
+
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+def heuristic_passes(network, rule, scheme, seed, passes):
+  # best of `passes` randomized passes with one priority rule and scheme
+  rng = random.Random(seed)
+  priority = priority_values(network, rule)
+  sgs = serial_sgs if scheme == 'serial' else parallel_sgs
+  best = None
+  for k in range(0, passes):
+    start = sgs(network, priority, rng)
+    if best is None or start[-1] < best[0]:
+      best = (start[-1], start)
+  return best
+
+
+def multi_pass_heuristic(network, passes=1000, workers=None, rules=tuple(PRIORITY_RULES), schemes=('serial', 'parallel'), seed=0):
+  # deterministic passes first, then the randomized passes split into one job per (rule, scheme)
+  if network.node_dict[0].lft is None:
+    compute_time_windows(network)
+  makespan, start, rule, scheme = heuristic_upper_bound(network, rules, schemes)
+  best = (makespan, start)
+  jobs = [(rule, scheme) for rule in rules for scheme in schemes]
+  per_job = max(passes // len(jobs), 1)
+  args = [(network, rule, scheme, seed*len(jobs) + n, per_job) for n, (rule, scheme) in enumerate(jobs)]
+  if workers == 1:
+    results = [heuristic_passes(*a) for a in args]
+  else:
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+      results = list(pool.map(heuristic_passes, *zip(*args)))
+  for result in results:
+    if result[0] < best[0]:
+      best = result
+  return best
+
+
+def set_mip_start(formulation, network, start, variables):
+  # formulation 'pulse', 'step' or 'flow', variables as created by the respective solve() method
+  if formulation == 'pulse' and variables.get('columns') is not None:
+    columns = variables['columns']
+    values = np.zeros(int((columns >= 0).sum()))
+    # a start outside the window (column -1) or the horizon has no variable, it is skipped as in the dict path
+    H = columns.shape[1]
+    ids = [columns[i, start[i]] for i in network.node_ids if 0 <= start[i] < H]
+    values[[c for c in ids if c >= 0]] = 1
+    variables['x'].Start = values
+  elif formulation == 'pulse':
+    for (i, t), var in variables['x'].items():
+      var.Start = 1 if t == start[i] else 0
+  elif formulation == 'step':
+    for (i, t), var in variables['eta'].items():
+      var.Start = 1 if t >= start[i] else 0
+  elif formulation == 'flow':
+    # the resource flows are left to Gurobi to complete the start
+    for i, var in variables['S'].items():
+      var.Start = start[i]
+    for (i, j), var in variables['x'].items():
+      var.Start = 1 if i != j and start[j] >= start[i] + network.node_dict[i].processing_time else 0
+
+"""### Time-Window Variable Index
+
+Once `compute_time_windows()` has set `est` and `lst`, activity $i$ can only start in $\{ES_i,\ldots,LS_i\}$. Instead of creating $x_{it}$ for the full grid $V \times T^{max}$ and fixing the out-of-window variables with constraints (ct_2_5, ct_2_14), the discrete-time formulations can be built with `windowed=True`, which creates variables only for the feasible pairs $(i, t)$ returned by `time_window_index()`.
+
+For the step formulations, $\eta_{it}$ is a constant outside the window ($0$ before $ES_i$, $1$ from $LS_i$ on), so only $t \in \{ES_i,\ldots,LS_i-1\}$ needs a variable. `step_value()` returns either the variable or the constant, and `step_start()` the start time expression $S_i = \sum_t t (\eta_{it} - \eta_{i,t-1})$.
+"""
+
+def time_windows(network, H, windowed=True):
+  # periods t for which x_it is created: [est_i, lst_i] clipped to the horizon, or the full grid
+  W = {}
+  for i in network.node_ids:
+    if windowed:
+      W[i] = range(max(network.node_dict[i].est, 0), min(network.node_dict[i].lst, H-1)+1)
+    else:
+      W[i] = range(0, H)
+  return W
+
+
+def time_window_index(network, H):
+  # all feasible pairs (i, t), ordered by activity and period
+  W = time_windows(network, H)
+  return [(i, t) for i in network.node_ids for t in W[i]]
+
+
+def step_value(eta, network, i, t):
+  # eta_it inside the window, 0 before est_i and 1 from lst_i on
+  if t < network.node_dict[i].est:
+    return 0
+  if t >= network.node_dict[i].lst:
+    return 1
+  return eta[i, t]
+
+
+def step_start(eta, network, i):
+  start = gp.LinExpr()
+  for t in range(max(network.node_dict[i].est, 0), network.node_dict[i].lst+1):
+    start += t * (step_value(eta, network, i, t) - step_value(eta, network, i, t-1))
+  return start
+
+"""### Resource-Based Time-Window Tightening
+
+`compute_time_windows()` only uses the precedence relations. `tighten_time_windows()` additionally uses the resources and repeats the following steps until no window changes:
+
+* the makespan is at least the *resource-based lower bound* $\max_k \lceil \sum_i r_{ik} p_i / R_k \rceil$,
+* *timetabling*: an activity cannot start where it would overload the compulsory parts $[LS_j, EF_j)$ of the other activities,
+* *energetic reasoning* on the intervals $[t_1, t_2)$ spanned by the time windows: if the energy the other activities must spend in the interval leaves too little room for activity $i$, the window of $i$ is shortened (this includes the edge-finding rules),
+* the new bounds are propagated along the precedence relations.
+
+It returns a report with the makespan lower bound and the number of time-indexed variables before and after the tightening, and `feasible=False` if the deadline $T^{max}$ cannot be met.
+"""
+
+import math
+
+def resource_lower_bound(network):
+  V = len(network.node_ids)
+  lb = network.node_dict[V-1].est
+  for k in range(0, len(network.resource_availability)):
+    energy = sum(network.node_dict[i].resource_requirements[k] * network.node_dict[i].processing_time for i in range(0, V))
+    lb = max(lb, math.ceil(energy / network.resource_availability[k]))
+  return lb
+
+
+def propagate_precedences(network, est, lst):
+  # longest paths starting from the current bounds
+  n = len(network.node_ids)
+  arcs = network.arcs
+  est, p = longest_paths(n, network.successor_index, lambda i, j: arcs[(i, j)], est)
+  s, p = longest_paths(n, network.predecessor_index, lambda j, i: arcs[(i, j)], [-t for t in lst])
+  return est, [-t for t in s]
+
+
+def timetable_propagation(p, r, R, est, lst):
+  # shift est / lst of every activity out of the overloads of the other activities' compulsory parts
+  V, K = r.shape
+  horizon = int(max(lst[i] + p[i] for i in range(0, V))) + 1
+  profile = np.zeros((horizon, K))
+  for i in range(0, V):
+    if lst[i] < est[i] + p[i]:
+      profile[lst[i]:est[i]+p[i]] += r[i]
+  est, lst = list(est), list(lst)
+  for j in range(0, V):
+    if p[j] == 0 or not np.any(r[j] > 0):
+      continue
+    own = np.zeros((horizon, K))
+    if lst[j] < est[j] + p[j]:
+      own[lst[j]:est[j]+p[j]] = r[j]
+    overload = np.any((profile - own + r[j] > R) & (r[j] > 0), axis=1)
+    while est[j] <= lst[j] and np.any(overload[est[j]:est[j]+p[j]]):
+      est[j] += int(np.flatnonzero(overload[est[j]:est[j]+p[j]])[-1]) + 1
+    while lst[j] >= est[j] and np.any(overload[lst[j]:lst[j]+p[j]]):
+      lst[j] -= p[j] - int(np.flatnonzero(overload[lst[j]:lst[j]+p[j]])[0])
+  return est, lst
+
+
+def energetic_reasoning(p, r, R, est, lst):
+  # returns the adjusted (est, lst) or None if some interval is overloaded
+  est, lst, p = np.array(est), np.array(lst), np.array(p)
+  eft, lft = est + p, lst + p
+  t1 = np.unique(np.concatenate((est, lst)))
+  t2 = np.unique(np.concatenate((eft, lft)))
+  t1, t2 = np.meshgrid(t1, t2, indexing='ij')
+  t1, t2 = t1[t1 < t2][:, None], t2[t1 < t2][:, None]
+  # processing time inside [t1, t2) if left shifted (start at est) / right shifted (start at lst)
+  left = np.clip(np.minimum(eft, t2) - np.maximum(est, t1), 0, None)
+  right = np.clip(np.minimum(lft, t2) - np.maximum(lst, t1), 0, None)
+  minimal = np.minimum(left, right)
+  # processing time after t1 if left shifted / before t2 if right shifted
+  after = np.clip(p - np.clip(t1 - est, 0, None), 0, None)
+  before = np.clip(p - np.clip(lft - t2, 0, None), 0, None)
+  new_est, new_lst = est.copy(), lst.copy()
+  for k in range(0, len(R)):
+    energy = minimal * r[:, k]
+    capacity = R[k] * (t2 - t1)[:, 0]
+    if np.any(energy.sum(axis=1) > capacity):
+      return None
+    slack = (capacity - energy.sum(axis=1))[:, None] + energy
+    demand = np.where(r[:, k] > 0, r[:, k], 1)
+    push = (r[:, k] * after > slack) & (r[:, k] > 0)
+    bound = t2 + np.ceil((r[:, k] * after - slack) / demand) - p
+    new_est = np.maximum(new_est, np.where(push, bound, new_est).max(axis=0).astype(int))
+    pull = (r[:, k] * before > slack) & (r[:, k] > 0)
+    bound = t1 - np.ceil((r[:, k] * before - slack) / demand)
+    new_lst = np.minimum(new_lst, np.where(pull, bound, new_lst).min(axis=0).astype(int))
+  return new_est.tolist(), new_lst.tolist()
+
+
+def tighten_time_windows(network, max_rounds=20):
+  V = len(network.node_ids)
+  H = int(network.Tmax)
+  if network.node_dict[0].est is None:
+    compute_time_windows(network)
+  compiled = network.compile()
+  p, r, R = compiled.p, compiled.r, compiled.R
+  variables_before = len(time_window_index(network, H))
+  est = [network.node_dict[i].est for i in range(0, V)]
+  lst = [network.node_dict[i].lst for i in range(0, V)]
+  est[V-1] = max(est[V-1], resource_lower_bound(network))
+  feasible = True
+  for rounds in range(0, max_rounds):
+    old = (est, lst)
+    est, lst = propagate_precedences(network, est, lst)
+    if any(est[i] > lst[i] for i in range(0, V)):
+      feasible = False
+      break
+    est, lst = timetable_propagation(p, r, R, est, lst)
+    if any(est[i] > lst[i] for i in range(0, V)):
+      feasible = False
+      break
+    bounds = energetic_reasoning(p, r, R, est, lst)
+    if bounds is None:
+      feasible = False
+      break
+    est, lst = bounds
+    if (est, lst) == old:
+      break
+  if feasible:
+    for i in range(0, V):
+      node = network.node_dict[i]
+      node.est, node.lst = est[i], lst[i]
+      node.eft, node.lft = est[i] + node.processing_time, lst[i] + node.processing_time
+  variables_after = len(time_window_index(network, H)) if feasible else 0
+  return {'name': network.name, 'feasible': feasible, 'lower_bound': est[V-1] if feasible else None,
+          'rounds': rounds + 1, 'variables_before': variables_before, 'variables_after': variables_after,
+          'eliminated': variables_before - variables_after}
+
+"""### Matrix Model Builder
+
+Building the discrete-time models term by term with `gp.LinExpr` spends most of the time in Python loops before Gurobi even starts. `build_pulse_matrices()` assembles the coefficient matrices of the pulse formulations in bulk as sparse matrices, so that every constraint family can be added with a single `addMConstr()` call. The pulse variables are stored in one flat vector, `window_columns()` gives the position of $x_{it}$ in it (the same order as `addVars()`). With `windowed=True` only the variables of `time_window_index()` are created. The resulting model is identical to the one built with the loops.
+"""
+
+import scipy.sparse as sp
+
+def window_columns(network, H, windowed=False):
+  # position of x_it in the flat variable vector, -1 if x_it is not created
+  V = len(network.node_ids)
+  W = time_windows(network, H, windowed)
+  columns = np.full((V, H), -1, dtype=int)
+  n = 0
+  for i in range(0, V):
+    columns[i, W[i].start:W[i].stop] = np.arange(n, n+len(W[i]))
+    n += len(W[i])
+  return columns
+
+
+def matrix_start(x, columns, i):
+  # S_i = sum_t t*x_it as matrix expression
+  t = np.flatnonzero(columns[i] >= 0)
+  return t @ x[columns[i, t[0]]:columns[i, t[-1]]+1]
+
+
+def build_pulse_matrices(network, H, disaggregated=False, windowed=False, row_ids=None, precedence=True):
+  # row_ids (dict): receives the indices of the rows kept per family, e.g. t*K + k for ct_2_3
+  # precedence=False: without ct_2_2 / ct_2_7, e.g. for build_prefix_precedence()
+
+  compiled = network.compile()
+  V, K = compiled.r.shape
+  E = list(network.arcs.keys())
+  T = np.arange(H)
+  p, r, C = compiled.p, compiled.r, compiled.R
+  est, lst = compiled.est, compiled.lst
+  columns = window_columns(network, H, windowed).ravel()
+  n_cols = int((columns >= 0).sum())
+  families = []
+
+  def add(name, rows, cols, data, sense, b):
+    # cols are grid positions i*H + t, terms of variables that are not created are dropped
+    cols = columns[cols]
+    keep = cols >= 0
+    A = sp.csr_matrix((data[keep], (rows[keep], cols[keep])), shape=(len(b), n_cols))
+    A.eliminate_zeros()
+    kept = np.arange(len(b))
+    if windowed:
+      nonempty = np.diff(A.indptr) > 0
+      A, b, kept = A[nonempty], b[nonempty], kept[nonempty]
+    if row_ids is not None:
+      row_ids[name] = kept
+    families.append((name, A, sense, b))
+
+  def stack(parts, dtype):
+    return np.concatenate(parts).astype(dtype) if parts else np.zeros(0, dtype=dtype)
+
+  if precedence and not disaggregated:
+    # ct_2_2: sum_t t*x_jt - sum_t t*x_it >= p_i for every arc (i, j)
+    ei = np.array([i for (i, j) in E], dtype=int)
+    ej = np.array([j for (i, j) in E], dtype=int)
+    rows = np.tile(np.repeat(np.arange(len(E)), H), 2)
+    cols = np.concatenate(((ej[:, None]*H + T).ravel(), (ei[:, None]*H + T).ravel()))
+    data = np.concatenate((np.tile(T, len(E)), -np.tile(T, len(E)))).astype(float)
+    add('ct_2_2', rows, cols, data, GRB.GREATER_EQUAL, p[ei].astype(float))
+  elif precedence:
+    # ct_2_7: sum_{tau <= t-p_i} x_i,tau - sum_{tau <= t} x_j,tau >= 0 for every arc (i, j) and period t
+    rows, cols, data = [], [], []
+    for e_idx, (i, j) in enumerate(E):
+      t_i, tau_i = np.tril_indices(H, k=-p[i])
+      t_j, tau_j = np.tril_indices(H)
+      if windowed:
+        # before est_j the row only has non-negative terms
+        t_i, tau_i = t_i[t_i >= est[j]], tau_i[t_i >= est[j]]
+        t_j, tau_j = t_j[t_j >= est[j]], tau_j[t_j >= est[j]]
+      rows += [e_idx*H + t_i, e_idx*H + t_j]
+      cols += [i*H + tau_i, j*H + tau_j]
+      data += [np.ones(len(t_i)), -np.ones(len(t_j))]
+    add('ct_2_7', stack(rows, int), stack(cols, int), stack(data, float), GRB.GREATER_EQUAL, np.zeros(len(E)*H))
+
+  # ct_2_3: sum_i sum_{tau = t-p_i+1}^{t} r_ik * x_i,tau <= R_k for every period t and resource k
+  rows, cols, data = [], [], []
+  for i in range(0, V):
+    ks = np.flatnonzero(r[i])
+    if p[i] == 0 or len(ks) == 0:
+      continue
+    tt = np.concatenate([np.arange(o, H) for o in range(0, p[i])])
+    tau = tt - np.concatenate([np.full(H-o, o) for o in range(0, p[i])])
+    rows.append((tt[:, None]*K + ks[None, :]).ravel())
+    cols.append(np.repeat(i*H + tau, len(ks)))
+    data.append(np.tile(r[i, ks], len(tt)))
+  add('ct_2_3', stack(rows, int), stack(cols, int), stack(data, float), GRB.LESS_EQUAL, np.tile(C, H))
+
+  # ct_2_4: sum_t x_it = 1 for every activity i
+  rows, cols = np.repeat(np.arange(V), H), np.arange(V*H)
+  add('ct_2_4a', rows, cols, np.ones(V*H), GRB.GREATER_EQUAL, np.ones(V))
+  add('ct_2_4b', rows, cols, np.ones(V*H), GRB.LESS_EQUAL, np.ones(V))
+
+  # ct_2_5: x_it = 0 outside of the time window [est_i, lst_i] (only needed on the full grid)
+  if not windowed:
+    outside = np.flatnonzero(((T[None, :] < est[:, None]) | (T[None, :] > lst[:, None])).ravel())
+    add('ct_2_5a', np.arange(len(outside)), outside, np.ones(len(outside)), GRB.GREATER_EQUAL, np.zeros(len(outside)))
+    add('ct_2_5b', np.arange(len(outside)), outside, np.ones(len(outside)), GRB.LESS_EQUAL, np.zeros(len(outside)))
+
+  return families
+
+"""### Solution Extraction
+
+After `optimize()`, `extract_solution()` queries the values of all variables of a formulation with one `getAttr()` call and decodes the start times: the period of the largest pulse $x_{it}$ (pulse), the first period with $\eta_{it} = 1$ (step) or the rounded $S_i$ (flow). The integer start times are written to the nodes and the makespan $S_{n}$ to the network, the status, objective value, bound, gap and runtime of the run are stored in `network.result`.
+
+With `trace=True`, every `solve()` method records the trajectory of the run, i.e. the time, incumbent, best bound and node count whenever the incumbent or the bound change (for Gurobi with the callback `record_trajectory()`). From the trajectory, `Result` computes the time to the first feasible solution and the *primal integral* (Berthold 2013), the integral of the primal gap over time, which measures how fast a formulation finds good solutions.
+
+With `profile=True`, every `solve()` method of the MIP formulations records a profile of its phases: `profile_phase()` is called at the end of every constraint family (e.g. ct_2_2, ct_2_3, ct_2_4, ct_2_5 of the pulse model) and stores the wall time since the previous phase together with the rows and nonzeros the family added. The model is updated at the end of every phase, so the time Gurobi needs to take over the rows is counted in the family and not in `optimize()`. `save_profile()` writes the profile as JSON, `save_profile_trace()` in the Chrome trace event format, which is shown as flame graph by chrome://tracing, Perfetto or speedscope.
+"""
+
+import json
+import time
+
+class Result:
+    # status of a solve() run, objective value, best bound, gap and runtime (None without a solution),
+    # trajectory: (time, incumbent, bound, nodes) whenever incumbent or bound changed, if recorded (trace=True),
+    # phases: wall times of optimize() and extract_solution(), size: number of variables, constraints and nonzeros,
+    # families: rows and nonzeros per constraint family, if reported by the model builder (windowed step formulations),
+    # preprocessing: what preprocess_flow() fixed and removed (pruned flow formulation),
+    # profile: build phases, optimize and extract with begin, wall time, rows and nonzeros, if recorded (profile=True)
+
+    __slots__ = ('formulation', 'status', 'objective', 'bound', 'gap', 'runtime', 'trajectory', 'phases', 'size', 'families', 'preprocessing', 'profile')
+
+    def __init__(self, formulation, status, objective=None, bound=None, gap=None, runtime=None, trajectory=None):
+        self.formulation=formulation
+        self.status=status
+        self.objective=objective
+        self.bound=bound
+        self.gap=gap
+        self.runtime=runtime
+        self.trajectory=trajectory
+        self.phases=None
+        self.size=None
+        self.families=None
+        self.preprocessing=None
+        self.profile=None
+
+
+    def __str__(self):
+        return '{} ({}): objective {}, bound {}, gap {}, runtime {}'.format(self.formulation, self.status, self.objective,
+                                                                            self.bound, self.gap, self.runtime)
+
+
+    def time_to_first_feasible(self):
+        return next((t for (t, incumbent, bound, nodes) in self.trajectory or [] if incumbent is not None), None)
+
+
+    def primal_integral(self, reference=None):
+        # integral of the primal gap over the runtime (1 without incumbent), reference: best known objective value
+        if self.trajectory is None:
+            return None
+        reference = self.objective if reference is None else reference
+        integral = 0
+        # gap 1 from the start until the first point, the last point holds until the end of the run
+        points = [(0, None, None, None)] + self.trajectory + [(self.runtime, self.objective, self.bound, None)]
+        for (t, incumbent, bound, nodes), (t_next, *rest) in zip(points, points[1:]):
+            if incumbent is None or reference is None:
+                gap = 1
+            elif incumbent == reference:
+                gap = 0
+            else:
+                gap = abs(incumbent - reference) / max(abs(incumbent), abs(reference))
+            integral += gap * (t_next - t)
+        return integral
+
+
+    def to_dict(self):
+        data = {attr: getattr(self, attr) for attr in self.__slots__}
+        data['time_to_first_feasible'] = self.time_to_first_feasible()
+        data['primal_integral'] = self.primal_integral()
+        return data
+
+
+GUROBI_STATUS = {
+  GRB.OPTIMAL: 'optimal',
+  GRB.INFEASIBLE: 'infeasible',
+  GRB.INF_OR_UNBD: 'infeasible',
+  GRB.TIME_LIMIT: 'time_limit',
+  GRB.NODE_LIMIT: 'node_limit',
+  GRB.SOLUTION_LIMIT: 'solution_limit',
+  GRB.INTERRUPTED: 'interrupted',
+}
+
+
+def grid_values(m, variables, shape):
+  # values of {(i, t): var} as dense array, variables that are not created are 0
+  grid = np.zeros(shape)
+  if len(variables) > 0:
+    i, t = np.array(list(variables.keys())).T
+    grid[i, t] = m.getAttr('X', list(variables.values()))
+  return grid
+
+
+def record_trajectory(model, where):
+  # Gurobi callback, appends (time, incumbent, bound, nodes) to model._trajectory when incumbent or bound change
+  if where == GRB.Callback.MIP:
+    point = [model.cbGet(GRB.Callback.RUNTIME), model.cbGet(GRB.Callback.MIP_OBJBST),
+             model.cbGet(GRB.Callback.MIP_OBJBND), model.cbGet(GRB.Callback.MIP_NODCNT)]
+  elif where == GRB.Callback.MIPSOL:
+    # MIPSOL_OBJBST is the incumbent before the new solution
+    point = [model.cbGet(GRB.Callback.RUNTIME), min(model.cbGet(GRB.Callback.MIPSOL_OBJ), model.cbGet(GRB.Callback.MIPSOL_OBJBST)),
+             model.cbGet(GRB.Callback.MIPSOL_OBJBND), model.cbGet(GRB.Callback.MIPSOL_NODCNT)]
+  else:
+    return
+  # no incumbent / no bound yet
+  if point[1] >= GRB.INFINITY:
+    point[1] = None
+  if point[2] <= -GRB.INFINITY:
+    point[2] = None
+  if not model._trajectory or model._trajectory[-1][1:3] != tuple(point[1:3]):
+    model._trajectory.append(tuple(point))
+
+
+def start_profile(m, profile=False):
+  # with profile=True, profile_phase() records the phases of m from now on
+  m._profile = [] if profile else None
+  m._profile_begin = m._phase_begin = time.perf_counter()
+  m._profile_size = (0, 0)
+
+
+def profile_phase(m, name):
+  # ends the phase name: wall time since the end of the previous phase, rows and nonzeros added
+  if getattr(m, '_profile', None) is None:
+    return
+  m.update()
+  end = time.perf_counter()
+  rows, nonzeros = m.NumConstrs, m.NumNZs
+  m._profile.append({'phase': name, 'begin': m._phase_begin - m._profile_begin, 'seconds': end - m._phase_begin,
+                     'rows': rows - m._profile_size[0], 'nonzeros': nonzeros - m._profile_size[1]})
+  m._profile_size = (rows, nonzeros)
+  m._phase_begin = time.perf_counter()
+
+
+def save_profile(result, path, name=None):
+  # profile of a run as JSON
+  with open(path, 'w') as f:
+    json.dump({'name': name, 'formulation': result.formulation, 'size': result.size, 'families': result.families, 'profile': result.profile}, f, indent=1)
+
+
+def save_profile_trace(results, path):
+  # profiles of runs [(name, result)] in the Chrome trace event format (times in microseconds), one row per run
+  events = []
+  for tid, (name, result) in enumerate(results):
+    phases = result.profile or []
+    end = max((phase['begin'] + phase['seconds'] for phase in phases), default=0)
+    events.append({'name': '{} {}'.format(name, result.formulation), 'ph': 'X', 'pid': 0, 'tid': tid, 'ts': 0, 'dur': end * 1e6,
+                   'args': result.size or {}})
+    for phase in phases:
+      events.append({'name': phase['phase'], 'ph': 'X', 'pid': 0, 'tid': tid, 'ts': phase['begin'] * 1e6, 'dur': phase['seconds'] * 1e6,
+                     'args': {'rows': phase['rows'], 'nonzeros': phase['nonzeros']}})
+  with open(path, 'w') as f:
+    json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+
+def optimize(m, trace=False, callback=None):
+  # m.optimize(), with trace=True the trajectory is recorded by record_trajectory()
+  # (a callback has to call record_trajectory() itself if m._trajectory is not None)
+  m.update()
+  m._size = {'variables': m.NumVars, 'constraints': m.NumConstrs, 'nonzeros': m.NumNZs}
+  m._trajectory = [] if trace else None
+  begin = time.perf_counter()
+  m.optimize(callback or (record_trajectory if trace else None))
+  m._optimize_time = time.perf_counter() - begin
+  profile_phase(m, 'optimize')
+
+
+def extract_solution(formulation, network, m, variables):
+  # formulation 'pulse', 'step' or 'flow', variables as for set_mip_start()
+  begin = time.perf_counter()
+  result = Result(formulation, GUROBI_STATUS.get(m.status, 'status {}'.format(m.status)), runtime=m.runtime)
+  network.result = result
+  result.trajectory = getattr(m, '_trajectory', None)
+  result.size = getattr(m, '_size', None)
+  result.preprocessing = getattr(m, '_preprocessing', None)
+  if m.SolCount > 0:
+    result.objective, result.bound, result.gap = m.ObjVal, m.ObjBound, m.MIPGap
+    start = decode_starts(formulation, network, m, variables)
+    for i in network.node_ids:
+      network.node_dict[i].start = int(start[i])
+    network.makespan = int(start[-1])
+  if result.trajectory is not None:
+    # closing point, also for runs solved in presolve or at the root without a callback
+    result.trajectory.append((m.Runtime, result.objective, result.bound, m.NodeCount))
+  result.phases = {'optimize': getattr(m, '_optimize_time', None), 'extract': time.perf_counter() - begin}
+  profile_phase(m, 'extract')
+  result.profile = getattr(m, '_profile', None)
+  return result
+
+
+def decode_starts(formulation, network, m, variables):
+  V = len(network.node_ids)
+  H = int(network.Tmax)
+  if formulation == 'pulse' and variables.get('columns') is not None:
+    columns = variables['columns']
+    grid = np.zeros(columns.shape)
+    grid[columns >= 0] = variables['x'].X[columns[columns >= 0]]
+    start = grid.argmax(axis=1)
+  elif formulation == 'pulse':
+    start = grid_values(m, variables['x'], (V, H)).argmax(axis=1)
+  elif formulation == 'step':
+    # eta_it = 1 from lst_i on, also where no variable is created (see step_value())
+    grid = grid_values(m, variables['eta'], (V, H+2))
+    for i in range(0, V):
+      grid[i, network.node_dict[i].lst:] = 1
+    start = (grid > 0.5).argmax(axis=1)
+  elif formulation == 'flow':
+    start = np.rint(m.getAttr('X', [variables['S'][i] for i in range(0, V)]))
+  return start
+
 """## 1 RCPSP Formulations
 
 Given a network $N=(V,E, \delta_{ij})$ with activities $V$, precedence relations $E$, and time lag relations $\delta_{ij}$, the *Resource-Constrained Project Scheduling Problem (RCPSP)*  holds as follows:
@@ -240,10 +1039,11 @@ a.) Aggregated (DT)
 """
 
 from time import process_time
-def solve_dt_pulse(network):
+def solve_dt_pulse(network, builder='loop', windowed=False, mip_start=None, trace=False, profile=False):
 
   # Creating the model within Gurobi
   m = gp.Model('PSP', env=e)
+  start_profile(m, profile)
 
   # Run Parameters
   m.Params.LogToConsole = 0
@@ -254,39 +1054,65 @@ def solve_dt_pulse(network):
   E = list(network.arcs.keys())
   H = int(network.Tmax)
   C = network.resource_availability
-  x = m.addVars(V, H, vtype=GRB.BINARY, name='pulse variable')
+  if builder == 'matrix':
+    columns = window_columns(network, H, windowed)
+    x = m.addMVar(int((columns >= 0).sum()), vtype=GRB.BINARY, name='pulse variable')
+    profile_phase(m, 'variables')
+
+    # Constraints
+    families = build_pulse_matrices(network, H, disaggregated=False, windowed=windowed)
+    profile_phase(m, 'matrices')
+    for (name, A, sense, b) in families:
+      m.addMConstr(A, x, sense, b, name=name)
+      profile_phase(m, name)
 
-  # Constraints
+  else:
+    W = time_windows(network, H, windowed)
+    if windowed:
+      x = m.addVars(time_window_index(network, H), vtype=GRB.BINARY, name='pulse variable')
+    else:
+      x = m.addVars(V, H, vtype=GRB.BINARY, name='pulse variable')
+    profile_phase(m, 'variables')
+
+    # Constraints
+
+    for (i, j) in E:
+      ct_2_2_lhs = gp.LinExpr()
+      for t in W[j]:
+        ct_2_2_lhs += t * x[j, t]
+      for t in W[i]:
+        ct_2_2_lhs -= t* x[i, t]
+      m.addConstr(ct_2_2_lhs >= network.node_dict[i].processing_time, name='ct_2_2')
+    profile_phase(m, 'ct_2_2')
 
-  for (i, j) in E:
-    ct_2_2_lhs = gp.LinExpr()
     for t in range(0, H):
-      ct_2_2_lhs += t * x[j, t]
-      ct_2_2_lhs -= t* x[i, t]
-    m.addConstr(ct_2_2_lhs >= network.node_dict[i].processing_time, name='ct_2_2')
-
-  for t in range(0, H):
-    for k in range(0, len(C)):
-      ct_2_3_lhs = gp.LinExpr()
-      for i in range(0, V):
-        for tau in range(t-network.node_dict[i].processing_time + 1, t+1):
-          if tau >= 0:
+      for k in range(0, len(C)):
+        ct_2_3_lhs = gp.LinExpr()
+        for i in range(0, V):
+          if network.node_dict[i].resource_requirements[k] == 0:
+            continue
+          for tau in range(max(t-network.node_dict[i].processing_time + 1, W[i].start), min(t, W[i].stop-1)+1):
             ct_2_3_lhs += network.node_dict[i].resource_requirements[k] * x[i, tau]
-      m.addConstr(ct_2_3_lhs <= C[k], name='ct_2_3')
+        if windowed and ct_2_3_lhs.size() == 0:
+          continue
+        m.addConstr(ct_2_3_lhs <= C[k], name='ct_2_3')
+    profile_phase(m, 'ct_2_3')
 
-  for i in range(0, V):
-    ct_2_4_lhs = gp.LinExpr()
-    for t in range(0, H):
-      ct_2_4_lhs += x[i, t]
-    m.addConstr(ct_2_4_lhs >= 1, name='ct_2_4a')
-    m.addConstr(ct_2_4_lhs <= 1, name='ct_2_4b')
+    for i in range(0, V):
+      ct_2_4_lhs = gp.LinExpr()
+      for t in W[i]:
+        ct_2_4_lhs += x[i, t]
+      m.addConstr(ct_2_4_lhs >= 1, name='ct_2_4a')
+      m.addConstr(ct_2_4_lhs <= 1, name='ct_2_4b')
+    profile_phase(m, 'ct_2_4')
 
-  for i in range(0, V):
-    tw = set(range(network.node_dict[i].est, network.node_dict[i].lst+1))
-    for t in range(0, H):
-      if t not in tw:
-        m.addConstr(x[i, t] >= 0, name='ct_2_5a')
-        m.addConstr(x[i, t] <= 0, name='ct_2_5b')
+    for i in range(0, V):
+      tw = set(range(network.node_dict[i].est, network.node_dict[i].lst+1))
+      for t in W[i]: # empty if only the window is created
+        if t not in tw:
+          m.addConstr(x[i, t] >= 0, name='ct_2_5a')
+          m.addConstr(x[i, t] <= 0, name='ct_2_5b')
+    profile_phase(m, 'ct_2_5')
 
   # ct 2_6 (x is binary) included in var definition
 
@@ -295,26 +1121,28 @@ def solve_dt_pulse(network):
   objective = gp.LinExpr()
 
   objective = 0
-  for t in range(0, H):
-      objective += t * x[V-1 , t] # V correct? debug
+  if builder == 'matrix':
+    objective = matrix_start(x, columns, V-1)
+  else:
+    for t in W[V-1]:
+        objective += t * x[V-1 , t] # V correct? debug
 
   m.setObjective(objective)
-  m.optimize()
+  if mip_start is not None:
+    set_mip_start('pulse', network, mip_start, {'x': x, 'columns': columns if builder == 'matrix' else None})
+  profile_phase(m, 'objective')
+  optimize(m, trace)
 
   # set makespan and node starting times
-  network.makespan = objective
-  for i in network.node_ids:
-    network.node_dict[i].start = 0
-    for t in range(0, H):
-      network.node_dict[i].start += x[i, t]*t
+  extract_solution('pulse', network, m, {'x': x, 'columns': columns if builder == 'matrix' else None})
 
   if m.status == GRB.OPTIMAL :
     # Output
     print("With the dt_pulse a solution was found for " + str(network.name))
     print("The best found objective value is: " + str(m.ObjVal))
     print("Solver runtime: " + str(m.runtime))
-    gap = m.Params.mipgap
-    ov = m.getObjective()
+    gap = network.result.gap
+    ov = m.ObjVal
     rt = m.runtime
 
     # Additional Output for Testing
@@ -331,23 +1159,55 @@ def solve_dt_pulse(network):
   else:
     print("Optimal solution not found")
     print("With the dt_pulse a solution was found for " + str(network.name))
-    print("The best found objective value is: " + str(m.ObjVal))
-    print("Solver runtime: " + str(m.runtime))
-    gap = m.Params.mipgap
-    ov = m.getObjective()
-    rt = m.runtime
-    return
+    print("The best found objective value is: " + str(network.result.objective))
+    print("Solver runtime: " + str(network.result.runtime))
+    gap = network.result.gap
+    ov = network.result.objective
+    rt = network.result.runtime
+    return ov, rt, gap
 
 """b.) Disaggregated (DDT)
 
 **[1.5 points]**
+
+Every ct_2_7 row sums the prefixes $\sum_{\tau \leq t-p_i} x_{i\tau}$ and $\sum_{\tau \leq t} x_{j\tau}$, so the rows of all arcs and periods have $O(|E| \cdot (T^{max})^2)$ nonzeros. With `compact=True`, `build_prefix_precedence()` introduces the prefix variables $y_{it} = \sum_{\tau \leq t} x_{i\tau}$ with $y_{it} = y_{i,t-1} + x_{it}$. Then ct_2_7 reads $y_{i,t-p_i} - y_{jt} \geq 0$ with at most two terms. $y_{it}$ is $0$ before and $1$ from the last period of the window of $i$ on, so the rows are only needed for the periods $t$ in which both prefixes can be fractional. Rows and nonzeros of the precedence constraints then grow linearly with the horizon.
 """
 
+def build_prefix_precedence(m, network, x, W):
+  # ct_2_7 on the prefix variables y_it = sum_{tau <= t} x_i,tau, x: {(i, t): var} for t in W[i]
+  y = m.addVars([(i, t) for i in network.node_ids for t in W[i][:-1]], lb=0, ub=1, vtype=GRB.CONTINUOUS, name='prefix variable')
+
+  def prefix(i, t):
+    # y_it inside the window, 0 before and 1 from the last period of the window on
+    if t < W[i].start:
+      return 0
+    if t >= W[i].stop - 1:
+      return 1
+    return y[i, t]
+
+  for i in network.node_ids:
+    for t in W[i][:-1]:
+      m.addConstr(y[i, t] - prefix(i, t-1) - x[i, t] == 0, name='prefix')
+  profile_phase(m, 'prefix')
+
+  for (i, j) in network.arcs:
+    p = network.node_dict[i].processing_time
+    # before W[j] y_jt = 0, from the end of W[i] + p_i on y_i,t-p_i = 1, after W[j] the row is implied
+    for t in range(W[j].start, min(W[i].stop - 1 + p, W[j].stop)):
+      ct_2_7_lhs = prefix(i, t-p) - prefix(j, t)
+      if isinstance(ct_2_7_lhs, int):
+        continue
+      m.addConstr(ct_2_7_lhs >= 0, name='ct_2_7')
+  profile_phase(m, 'ct_2_7')
+  return y
+
+
 from os import name
-def solve_ddt_pulse(network):
+def solve_ddt_pulse(network, builder='loop', windowed=False, mip_start=None, trace=False, profile=False, compact=False):
 
   # Creating the model within Gurobi
   m = gp.Model('PSP', env=e)
+  start_profile(m, profile)
 
   # Run Parameters
   m.Params.LogToConsole = 0
@@ -358,41 +1218,76 @@ def solve_ddt_pulse(network):
   E = list(network.arcs.keys())
   H = int(network.Tmax)
   C = network.resource_availability
-  x = m.addVars(V, H, vtype=GRB.BINARY, name='pulse variable')
+  if builder == 'matrix':
+    columns = window_columns(network, H, windowed)
+    x = m.addMVar(int((columns >= 0).sum()), vtype=GRB.BINARY, name='pulse variable')
+    profile_phase(m, 'variables')
+
+    # Constraints
+    families = build_pulse_matrices(network, H, disaggregated=True, windowed=windowed, precedence=not compact)
+    profile_phase(m, 'matrices')
+    for (name, A, sense, b) in families:
+      m.addMConstr(A, x, sense, b, name=name)
+      profile_phase(m, name)
+    if compact:
+      W = time_windows(network, H, windowed)
+      x_list = x.tolist()
+      build_prefix_precedence(m, network, {(i, t): x_list[columns[i, t]] for i in range(0, V) for t in W[i]}, W)
 
-  # Constraints
+  else:
+    W = time_windows(network, H, windowed)
+    if windowed:
+      x = m.addVars(time_window_index(network, H), vtype=GRB.BINARY, name='pulse variable')
+    else:
+      x = m.addVars(V, H, vtype=GRB.BINARY, name='pulse variable')
+    profile_phase(m, 'variables')
+
+    # Constraints
+
+    if compact:
+      build_prefix_precedence(m, network, x, W)
+
+    else:
+      for (i, j) in E:
+        for t in range(0, H):
+          if t < W[j].start:
+            continue # no negative term, the row is always satisfied
+          ct_2_7_lhs = gp.LinExpr()
+          for tau in range(W[i].start, min(t-network.node_dict[i].processing_time, W[i].stop-1)+1): # range correct?
+            ct_2_7_lhs += x[i, tau]
+          for tau in range(W[j].start, min(t, W[j].stop-1)+1):
+            ct_2_7_lhs -= x[j, tau]
+          m.addConstr(ct_2_7_lhs >= 0, name='ct_2_7')
+      profile_phase(m, 'ct_2_7')
 
-  for (i, j) in E:
-      for t in range(0, H):
-        ct_2_7_lhs = gp.LinExpr()
-        for tau in range(0, t-network.node_dict[i].processing_time+1): # range correct?
-          ct_2_7_lhs += x[i, tau]
-        for tau in range(0, t+1):
-          ct_2_7_lhs -= x[j, tau]
-        m.addConstr(ct_2_7_lhs >= 0, name='ct_2_7')
-
-  for t in range(0, H):
-    for k in range(0, len(C)):
-      ct_2_3_lhs = gp.LinExpr()
-      for i in range(0, V):
-        for tau in range(t-network.node_dict[i].processing_time + 1, t+1):
-          if tau >= 0:
+    for t in range(0, H):
+      for k in range(0, len(C)):
+        ct_2_3_lhs = gp.LinExpr()
+        for i in range(0, V):
+          if network.node_dict[i].resource_requirements[k] == 0:
+            continue
+          for tau in range(max(t-network.node_dict[i].processing_time + 1, W[i].start), min(t, W[i].stop-1)+1):
             ct_2_3_lhs += network.node_dict[i].resource_requirements[k] * x[i, tau]
-      m.addConstr(ct_2_3_lhs <= C[k], name='ct_2_3')
+        if windowed and ct_2_3_lhs.size() == 0:
+          continue
+        m.addConstr(ct_2_3_lhs <= C[k], name='ct_2_3')
+    profile_phase(m, 'ct_2_3')
 
-  for i in range(0, V):
-    ct_2_4_lhs = gp.LinExpr()
-    for t in range(0, H):
-      ct_2_4_lhs += x[i, t]
-    m.addConstr(ct_2_4_lhs >= 1, name='ct_2_4a')
-    m.addConstr(ct_2_4_lhs <= 1, name='ct_2_4b')
+    for i in range(0, V):
+      ct_2_4_lhs = gp.LinExpr()
+      for t in W[i]:
+        ct_2_4_lhs += x[i, t]
+      m.addConstr(ct_2_4_lhs >= 1, name='ct_2_4a')
+      m.addConstr(ct_2_4_lhs <= 1, name='ct_2_4b')
+    profile_phase(m, 'ct_2_4')
 
-  for i in range(0, V):
-    tw = set(range(network.node_dict[i].est, network.node_dict[i].lst+1))
-    for t in range(0, H):
-      if t not in tw:
-        m.addConstr(x[i, t] >= 0, name='ct_2_5a')
-        m.addConstr(x[i, t] <= 0, name='ct_2_5b')
+    for i in range(0, V):
+      tw = set(range(network.node_dict[i].est, network.node_dict[i].lst+1))
+      for t in W[i]: # empty if only the window is created
+        if t not in tw:
+          m.addConstr(x[i, t] >= 0, name='ct_2_5a')
+          m.addConstr(x[i, t] <= 0, name='ct_2_5b')
+    profile_phase(m, 'ct_2_5')
 
   # ct 2_6 (x is binary) included in var definition
 
@@ -401,26 +1296,28 @@ def solve_ddt_pulse(network):
   objective = gp.LinExpr()
 
   objective = 0
-  for t in range(0, H):
-      objective += t * x[V-1 , t]
+  if builder == 'matrix':
+    objective = matrix_start(x, columns, V-1)
+  else:
+    for t in W[V-1]:
+        objective += t * x[V-1 , t]
 
   m.setObjective(objective)
-  m.optimize()
+  if mip_start is not None:
+    set_mip_start('pulse', network, mip_start, {'x': x, 'columns': columns if builder == 'matrix' else None})
+  profile_phase(m, 'objective')
+  optimize(m, trace)
 
   # set makespan and node starting times
-  network.makespan = objective
-  for i in network.node_ids:
-    network.node_dict[i].start = 0
-    for t in range(0, H):
-      network.node_dict[i].start += x[i, t]*t
+  extract_solution('pulse', network, m, {'x': x, 'columns': columns if builder == 'matrix' else None})
 
   if m.status == GRB.OPTIMAL :
     # Output
     print("With the ddt_pulse a solution was found for " + str(network.name))
     print("The best found objective value is: " + str(m.ObjVal))
     print("Solver runtime: " + str(m.runtime))
-    gap = m.Params.mipgap
-    ov = m.getObjective()
+    gap = network.result.gap
+    ov = m.ObjVal
     rt = m.runtime
 
     # Additional Output for Testing
@@ -437,11 +1334,11 @@ def solve_ddt_pulse(network):
   else:
     print("Optimal solution not found")
     print("With the ddt_pulse a solution was found for " + str(network.name))
-    print("The best found objective value is: " + str(m.ObjVal))
-    print("Solver runtime: " + str(m.runtime))
-    gap = m.Params.mipgap
-    ov = m.getObjective()
-    rt = m.runtime
+    print("The best found objective value is: " + str(network.result.objective))
+    print("Solver runtime: " + str(network.result.runtime))
+    gap = network.result.gap
+    ov = network.result.objective
+    rt = network.result.runtime
     return ov, rt, gap
 
 """### 1.2 Step Variables
@@ -450,12 +1347,86 @@ Implement the *Discrete-Time Formulations Based on "Step" Start Variables* (see
 a.) Aggregated (DT)
 
 **[3.5 points]**
+
+The step variables $\eta_{it}$ (activity $i$ has started by $t$) run from $t = 0$ to $T^{max}$, so that the start $S_i = \sum_{t=1}^{T^{max}} t (\eta_{it} - \eta_{i,t-1})$ can also be $T^{max}$. Every constraint family is added once: one ct_2_16 row per arc, one ct_2_11 row per period and resource and one ct_2_13 row per activity and period. With `windowed=True`, `build_windowed_step()` only creates the variables inside the time windows. It writes the start as $S_i = LS_i - \sum_{t=ES_i}^{LS_i-1} \eta_{it}$, and collects the resource terms of every activity only for the periods it can be in process. The rows and nonzeros per family, which it reports in `size` (stored by `solve_dt_step()` and `solve_ddt_step()` in `network.result.families`), then grow linearly with the horizon.
 """
 
-def solve_dt_step(network):
+def build_windowed_step(m, network, H, disaggregated=False, resource_rows=None, size=None, resource_terms=None):
+  # step model on the time windows: eta_it only for t in [est_i, lst_i - 1], see step_value()
+  # resource_rows (list): receives (row, k, constant) for every ct_2_11 row that can bind for some R_k
+  # size (dict): receives (rows, nonzeros) of every constraint family
+  # resource_terms (dict): receives the ct_2_11 rows {(t, k): (coefficients, variables, [constant])} instead of the model
+
+  K = len(network.resource_availability)
+  C = network.resource_availability
+  nodes = network.node_dict
+  W = {i: range(max(nodes[i].est, 0), min(nodes[i].lst, H+1)) for i in network.node_ids}
+  eta = m.addVars([(i, t) for i in network.node_ids for t in W[i]], vtype=GRB.BINARY, name='step variable')
+  profile_phase(m, 'variables')
+  size = {} if size is None else size
+
+  def add(name, lhs, sense, rhs):
+    rows, nonzeros = size.get(name, (0, 0))
+    size[name] = (rows + 1, nonzeros + lhs.size())
+    return m.addLConstr(lhs, sense, rhs, name=name)
+
+  if not disaggregated:
+    # S_i = lst_i - sum_t eta_it, since eta_it = 1 from S_i on
+    for (i, j) in network.arcs:
+      ct_2_16_lhs = gp.LinExpr([1] * len(W[i]), [eta[i, t] for t in W[i]])
+      ct_2_16_lhs.addTerms([-1] * len(W[j]), [eta[j, t] for t in W[j]])
+      add('ct_2_16', ct_2_16_lhs, GRB.GREATER_EQUAL, nodes[i].processing_time + nodes[i].lst - nodes[j].lst)
+    profile_phase(m, 'ct_2_16')
+  else:
+    for (i, j) in network.arcs:
+      for t in range(max(nodes[j].est, 0), nodes[j].lst):
+        ct_2_10_lhs = step_value(eta, network, i, t-nodes[i].processing_time) - eta[j, t]
+        add('ct_2_10', ct_2_10_lhs, GRB.GREATER_EQUAL, 0)
+    profile_phase(m, 'ct_2_10')
+
+  # ct_2_11: the terms r_ik * (eta_it - eta_i,t-p_i) are collected per activity for the periods it can be in process
+  terms = {}
+  for i in network.node_ids:
+    p = nodes[i].processing_time
+    if p == 0:
+      continue
+    for k in range(0, K):
+      r = nodes[i].resource_requirements[k]
+      if r == 0:
+        continue
+      for t in range(max(nodes[i].est, 0), min(nodes[i].lst + p, H)):
+        coefficients, variables, constant = terms.setdefault((t, k), ([], [], [0]))
+        for (value, coefficient) in ((step_value(eta, network, i, t), r), (step_value(eta, network, i, t-p), -r)):
+          if isinstance(value, int):
+            constant[0] += coefficient * value
+          else:
+            coefficients.append(coefficient)
+            variables.append(value)
+  if resource_terms is not None:
+    resource_terms.update(terms)
+    terms = {}
+  for (t, k) in sorted(terms):
+    coefficients, variables, constant = terms[t, k]
+    ct_2_11_lhs = gp.LinExpr(coefficients, variables)
+    if resource_rows is not None and (len(variables) > 0 or constant[0] > 0):
+      resource_rows.append((add('ct_2_11', ct_2_11_lhs, GRB.LESS_EQUAL, C[k] - constant[0]), k, constant[0]))
+    elif len(variables) > 0 or constant[0] > C[k]:
+      add('ct_2_11', ct_2_11_lhs, GRB.LESS_EQUAL, C[k] - constant[0])
+  profile_phase(m, 'ct_2_11')
+
+  for i in network.node_ids:
+    for t in W[i][1:]:
+      add('ct_2_13', eta[i, t] - eta[i, t-1], GRB.GREATER_EQUAL, 0)
+  profile_phase(m, 'ct_2_13')
+
+  # ct_2_12 and ct_2_14 hold by construction of step_value()
+  return eta
+
+def solve_dt_step(network, windowed=False, mip_start=None, trace=False, profile=False):
 
   # Creating the model within Gurobi
   m = gp.Model('PSP', env=e)
+  start_profile(m, profile)
 
   # Run Parameters
   m.Params.LogToConsole = 0
@@ -466,42 +1437,56 @@ def solve_dt_step(network):
   E = list(network.arcs.keys())
   H = int(network.Tmax)
   C = network.resource_availability
-  eta = m.addVars(V, H+1, vtype=GRB.BINARY, name='step variable')
+  if windowed:
+    families = {}
+    eta = build_windowed_step(m, network, H, disaggregated=False, size=families)
 
-  # constraints
+  else:
+    eta = m.addVars(V, H+1, vtype=GRB.BINARY, name='step variable')
+    profile_phase(m, 'variables')
+
+    # constraints
 
-  for (i, j) in E:
-    ct_2_16_lhs = gp.LinExpr()
-    for t in range(1, H):
-      ct_2_16_lhs += t * (eta[j, t] - eta[j, t-1])
-      ct_2_16_lhs -= t * (eta[i, t] - eta[i, t-1])
-    m.addConstr(ct_2_16_lhs >= network.node_dict[i].processing_time, name='ct_2_16')
+    for (i, j) in E:
+      ct_2_16_lhs = gp.LinExpr()
+      for t in range(1, H+1):
+        ct_2_16_lhs += t * (eta[j, t] - eta[j, t-1])
+        ct_2_16_lhs -= t * (eta[i, t] - eta[i, t-1])
+      m.addConstr(ct_2_16_lhs >= network.node_dict[i].processing_time, name='ct_2_16')
+    profile_phase(m, 'ct_2_16')
 
     for t in range(0, H):
       for k in range(0, len(C)):
         ct_2_11_lhs = gp.LinExpr()
         for i in range(0, V):
+          if network.node_dict[i].resource_requirements[k] == 0 or network.node_dict[i].processing_time == 0:
+            continue
+          ct_2_11_lhs += network.node_dict[i].resource_requirements[k] * eta[i, t]
           if t-network.node_dict[i].processing_time >= 0:
-            ct_2_11_lhs += network.node_dict[i].resource_requirements[k] * (eta[i, t] - eta[i, t-network.node_dict[i].processing_time])
-            m.addConstr(ct_2_11_lhs <= network.resource_availability[k], name='ct_2_11')
+            ct_2_11_lhs -= network.node_dict[i].resource_requirements[k] * eta[i, t-network.node_dict[i].processing_time]
+        m.addConstr(ct_2_11_lhs <= network.resource_availability[k], name='ct_2_11')
+    profile_phase(m, 'ct_2_11')
 
     for i in range(0, V):
       ct_2_12_lhs = gp.LinExpr()
-      ct_2_12_lhs += eta[i, network.node_dict[i].lst] # lst index correct?
+      ct_2_12_lhs += eta[i, network.node_dict[i].lst]
       m.addConstr(ct_2_12_lhs >= 1, name='ct_2_12a')
       m.addConstr(ct_2_12_lhs <= 1, name='ct_2_12b')
+    profile_phase(m, 'ct_2_12')
 
     for i in range(0, V):
-      for t in range(1, H): # I start from 1 to avoid undefined index "t = -1"
+      for t in range(1, H+1): # I start from 1 to avoid undefined index "t = -1"
           ct_2_13_lhs = gp.LinExpr()
           ct_2_13_lhs += eta[i, t] - eta[i, t-1]
           m.addConstr(ct_2_13_lhs >= 0, name='ct_2_13')
+    profile_phase(m, 'ct_2_13')
 
     for i in range (0, V):
       for t in range(0, H):
         if t <= network.node_dict[i].est-1:
           m.addConstr(eta[i, t] >= 0, name='ct_2_14a')
           m.addConstr(eta[i, t] <= 0, name='ct_2_14b')
+    profile_phase(m, 'ct_2_14')
 
     # ct15 implicitly stated in var definition ?
 
@@ -510,27 +1495,30 @@ def solve_dt_step(network):
   objective = gp.LinExpr()
 
   objective = 0
-  for t in range(1, H):
-      objective += t * (eta[V-1, t] - eta[V-1, t-1]) # V correct?
+  if windowed:
+    objective = step_start(eta, network, V-1)
+  else:
+    for t in range(1, H+1):
+        objective += t * (eta[V-1, t] - eta[V-1, t-1])
 
   m.setObjective(objective)
-  m.optimize()
+  if mip_start is not None:
+    set_mip_start('step', network, mip_start, {'eta': eta})
+  profile_phase(m, 'objective')
+  optimize(m, trace)
 
   # set makespan and node starting times
-  network.makespan = objective
-  for i in range(0, V):
-    network.node_dict[i].start = 0
-    for t in range(1, H):
-      network.node_dict[i].start = t * (eta[i, t] - eta[i, t-1])
-
+  extract_solution('step', network, m, {'eta': eta})
+  if windowed:
+    network.result.families = families
 
   if m.status == GRB.OPTIMAL:
     # Output
     print("With the dt_step a solution was found for " + str(network.name))
     print("The best found objective value is: " + str(m.ObjVal))
     print("Solver runtime: " + str(m.runtime))
-    gap = m.Params.mipgap
-    ov = m.getObjective()
+    gap = network.result.gap
+    ov = m.ObjVal
     rt = m.runtime
 
     # Additional Output for Testing
@@ -543,23 +1531,24 @@ def solve_dt_step(network):
   else:
     print("Optimal solution not found")
     print("With the dt_step a solution was found for " + str(network.name))
-    print("The best found objective value is: " + str(m.ObjVal))
-    print("Solver runtime: " + str(m.runtime))
-    gap = m.Params.mipgap
-    ov = m.getObjective()
-    rt = m.runtime
+    print("The best found objective value is: " + str(network.result.objective))
+    print("Solver runtime: " + str(network.result.runtime))
+    gap = network.result.gap
+    ov = network.result.objective
+    rt = network.result.runtime
 
-    return
+    return ov, rt, gap
 
 """b.) Disaggregated (DDT)
 
 **[1.5 points]**
 """
 
-def solve_ddt_step(network):
+def solve_ddt_step(network, windowed=False, mip_start=None, trace=False, profile=False):
 
   # Creating the model within Gurobi
   m = gp.Model('PSP', env=e)
+  start_profile(m, profile)
 
   # Run Parameters
   m.Params.LogToConsole = 0
@@ -570,71 +1559,89 @@ def solve_ddt_step(network):
   E = list(network.arcs.keys())
   H = int(network.Tmax)
   C = network.resource_availability
-  eta = m.addVars(V, H+1, vtype=GRB.BINARY, name='step variable')
+  if windowed:
+    families = {}
+    eta = build_windowed_step(m, network, H, disaggregated=True, size=families)
+
+  else:
+    eta = m.addVars(V, H+1, vtype=GRB.BINARY, name='step variable')
+    profile_phase(m, 'variables')
 
-  # constraints
+    # constraints
 
-  for (i, j) in E:
-    for t in range(0, H):
-      if t-network.node_dict[i].processing_time >= 0:
+    for (i, j) in E:
+      for t in range(0, H+1):
         ct_2_10_lhs = gp.LinExpr()
-        ct_2_10_lhs += eta[i, t-network.node_dict[i].processing_time] - eta[j, t]
+        if t-network.node_dict[i].processing_time >= 0:
+          ct_2_10_lhs += eta[i, t-network.node_dict[i].processing_time]
+        ct_2_10_lhs -= eta[j, t]
         m.addConstr(ct_2_10_lhs >= 0, name='ct_2_10')
+    profile_phase(m, 'ct_2_10')
 
-  for t in range(0, H):
-    for k in range(0, len(C)):
-      ct_2_11_lhs = gp.LinExpr()
-      for i in range(0, V):
-        if t-network.node_dict[i].processing_time >= 0:
-          ct_2_11_lhs += network.node_dict[i].resource_requirements[k] * (eta[i, t] - eta[i, t-network.node_dict[i].processing_time])
-          m.addConstr(ct_2_11_lhs <= network.resource_availability[k], name='ct_2_11')
+    for t in range(0, H):
+      for k in range(0, len(C)):
+        ct_2_11_lhs = gp.LinExpr()
+        for i in range(0, V):
+          if network.node_dict[i].resource_requirements[k] == 0 or network.node_dict[i].processing_time == 0:
+            continue
+          ct_2_11_lhs += network.node_dict[i].resource_requirements[k] * eta[i, t]
+          if t-network.node_dict[i].processing_time >= 0:
+            ct_2_11_lhs -= network.node_dict[i].resource_requirements[k] * eta[i, t-network.node_dict[i].processing_time]
+        m.addConstr(ct_2_11_lhs <= network.resource_availability[k], name='ct_2_11')
+    profile_phase(m, 'ct_2_11')
 
-  for i in range(0, V):
-    ct_2_12_lhs = gp.LinExpr()
-    ct_2_12_lhs += eta[i, network.node_dict[i].lst] # lst index correct?
-    m.addConstr(ct_2_12_lhs >= 1, name='ct_2_12a')
-    m.addConstr(ct_2_12_lhs <= 1, name='ct_2_12b')
+    for i in range(0, V):
+      ct_2_12_lhs = gp.LinExpr()
+      ct_2_12_lhs += eta[i, network.node_dict[i].lst]
+      m.addConstr(ct_2_12_lhs >= 1, name='ct_2_12a')
+      m.addConstr(ct_2_12_lhs <= 1, name='ct_2_12b')
+    profile_phase(m, 'ct_2_12')
 
-  for i in range(0, V):
-    for t in range(1, H): # I start from 1 to avoid undefined index "t = -1"
-        ct_2_13_lhs = gp.LinExpr()
-        ct_2_13_lhs += eta[i, t] - eta[i, t-1]
-        m.addConstr(ct_2_13_lhs >= 0, name='ct_2_13')
+    for i in range(0, V):
+      for t in range(1, H+1): # I start from 1 to avoid undefined index "t = -1"
+          ct_2_13_lhs = gp.LinExpr()
+          ct_2_13_lhs += eta[i, t] - eta[i, t-1]
+          m.addConstr(ct_2_13_lhs >= 0, name='ct_2_13')
+    profile_phase(m, 'ct_2_13')
 
-  for i in range (0, V):
-    for t in range(0, H):
-      if t <= network.node_dict[i].est-1:
-        m.addConstr(eta[i, t] >= 0, name='ct_2_14a')
-        m.addConstr(eta[i, t] <= 0, name='ct_2_14b')
+    for i in range (0, V):
+      for t in range(0, H):
+        if t <= network.node_dict[i].est-1:
+          m.addConstr(eta[i, t] >= 0, name='ct_2_14a')
+          m.addConstr(eta[i, t] <= 0, name='ct_2_14b')
+    profile_phase(m, 'ct_2_14')
 
-  # ct15 implicitly stated in var definition ?
+    # ct15 implicitly stated in var definition ?
 
   # OF
   m.modelSense = gp.GRB.MINIMIZE
   objective = gp.LinExpr()
 
   objective = 0
-  for t in range(1, H):
-      objective += t * (eta[V-1, t] - eta[V-1, t-1]) # V correct?
+  if windowed:
+    objective = step_start(eta, network, V-1)
+  else:
+    for t in range(1, H+1):
+        objective += t * (eta[V-1, t] - eta[V-1, t-1])
 
   m.setObjective(objective)
-  m.optimize()
+  if mip_start is not None:
+    set_mip_start('step', network, mip_start, {'eta': eta})
+  profile_phase(m, 'objective')
+  optimize(m, trace)
 
   # set makespan and node starting times
-  network.makespan = objective
-  for i in range(0, V):
-    network.node_dict[i].start = 0
-    for t in range(1, H):
-      network.node_dict[i].start = t * (eta[i, t] - eta[i, t-1])
-
+  extract_solution('step', network, m, {'eta': eta})
+  if windowed:
+    network.result.families = families
 
   if m.status == GRB.OPTIMAL:
     # Output
     print("With the ddt_step a solution was found for " + str(network.name))
     print("The best found objective value is: " + str(m.ObjVal))
     print("Solver runtime: " + str(m.runtime))
-    gap = m.Params.mipgap
-    ov = m.getObjective()
+    gap = network.result.gap
+    ov = m.ObjVal
     rt = m.runtime
 
     # Additional Output for Testing
@@ -647,25 +1654,119 @@ def solve_ddt_step(network):
   else:
     print("Optimal solution not found")
     print("With the ddt_step a solution was found for " + str(network.name))
-    print("The best found objective value is: " + str(m.ObjVal))
-    print("Solver runtime: " + str(m.runtime))
-    gap = m.Params.mipgap
-    ov = m.getObjective()
-    rt = m.runtime
+    print("The best found objective value is: " + str(network.result.objective))
+    print("Solver runtime: " + str(network.result.runtime))
+    gap = network.result.gap
+    ov = network.result.objective
+    rt = network.result.runtime
 
-    return
+    return ov, rt, gap
 
 """### 1.3 Flow Variables
 
 Implement the flow-based formulation with continuous-time variables as introduced in the lecture.
 
 **[5 points]**
+
+The dummy start and end activity supply and receive the full availability $R_k$ (`flow_demand()`). With `pruned=True`, `preprocess_flow()` reduces the model before it is built. It fixes $x_{ij}$ if the precedence relations (transitive closure) or the time windows already decide the order of $i$ and $j$. It drops $f_{ijk}$ if one of the two activities does not need resource $k$, and it replaces the global big-M $2T^{max}$ in ct_2_18 by $M_{ij} = LS_i + p_i - ES_j$. The start times are bounded by their time windows, which makes these $M_{ij}$ valid. The report of the preprocessing is kept in `network.result.preprocessing`.
 """
 
-def solve_flow(network):
+def flow_demand(network, i, k):
+  # the dummy start and end activity pass on the full availability R_k
+  if i == 0 or i == len(network.node_ids)-1:
+    return network.resource_availability[k]
+  return network.node_dict[i].resource_requirements[k]
+
+
+def preprocess_flow(network):
+  # fixed sequencing variables x_ij, big-M of the free pairs and the flows f_ijk that can be positive
+  V = len(network.node_ids)
+  K = len(network.resource_availability)
+  nodes = network.node_dict
+  if nodes[0].lst is None:
+    compute_time_windows(network)
+  reach = transitive_closure(network)
+  fixed, M = {}, {}
+  for i in range(0, V-1):
+    for j in range(1, V):
+      p_i = nodes[i].processing_time
+      if i == j or (reach[j] >> i) & 1 or nodes[i].est + p_i > nodes[j].lst:
+        fixed[i, j] = 0 # j precedes i, or i cannot be finished before the latest start of j
+      elif (reach[i] >> j) & 1 or nodes[i].lst + p_i <= nodes[j].est:
+        fixed[i, j] = 1 # i precedes j, or the time windows order i before j
+      else:
+        M[i, j] = nodes[i].lst + p_i - nodes[j].est # S_j - S_i >= est_j - lst_i
+  flows = [(i, j, k) for i in range(0, V-1) for j in range(1, V) for k in range(0, K)
+           if fixed.get((i, j)) != 0 and flow_demand(network, i, k) > 0 and flow_demand(network, j, k) > 0]
+
+  pairs = (V-1) * (V-1)
+  report = {'x_fixed_0': sum(1 for v in fixed.values() if v == 0),
+            'x_fixed_1': sum(1 for v in fixed.values() if v == 1),
+            'f_removed': pairs*K - len(flows),
+            'big_m_removed': pairs - len(M),
+            'big_m_max': max(M.values(), default=0),
+            'big_m_original': 2*network.Tmax}
+  return fixed, M, flows, report
+
+
+def build_pruned_flow(m, network, S):
+  # flow model on the preprocessed pairs, S_i is bounded by the time window [est_i, lst_i]
+  V = len(network.node_ids)
+  K = len(network.resource_availability)
+  fixed, M, flows, report = preprocess_flow(network)
+  m._preprocessing = report # stored in network.result by extract_solution()
+  profile_phase(m, 'preprocessing')
+  print("Flow preprocessing for {}: {} of {} x fixed, {} of {} f and {} of {} big-M terms removed, largest M {} instead of {}".format(
+      network.name, len(fixed), (V-1)*(V-1), report['f_removed'], (V-1)*(V-1)*K,
+      report['big_m_removed'], (V-1)*(V-1), report['big_m_max'], report['big_m_original']))
+
+  for i in range(0, V):
+    S[i].lb = network.node_dict[i].est
+    S[i].ub = network.node_dict[i].lst
+  x = m.addVars(list(M.keys()), vtype=GRB.BINARY, name='activity sequencing variable')
+  f = m.addVars(flows, lb = 0, vtype=GRB.CONTINUOUS, name='resource flow variable')
+  profile_phase(m, 'variables')
+
+  # ct_2_17 and ct_2_18: precedence arcs, pair-specific big-M for the free pairs
+  for (i, j) in network.arcs:
+    m.addConstr(S[j] - S[i] >= network.node_dict[i].processing_time, name='ct_2_17')
+  profile_phase(m, 'ct_2_17')
+  for (i, j), M_ij in M.items():
+    m.addConstr(S[j] - S[i] - M_ij * x[i, j] >= network.node_dict[i].processing_time - M_ij, name='ct_2_18')
+  profile_phase(m, 'ct_2_18')
+
+  # ct_2_19: flows of fixed pairs are bounded directly
+  for (i, j, k) in flows:
+    bound = min(flow_demand(network, i, k), flow_demand(network, j, k))
+    if (i, j) in x:
+      m.addConstr(f[i, j, k] - bound * x[i, j] <= 0, name='ct_2_19')
+    else:
+      f[i, j, k].ub = bound
+  profile_phase(m, 'ct_2_19')
+
+  # ct_2_20 and ct_2_21: outflow and inflow
+  outflow, inflow = {}, {}
+  for (i, j, k) in flows:
+    outflow.setdefault((i, k), []).append(f[i, j, k])
+    inflow.setdefault((j, k), []).append(f[i, j, k])
+  for i in range(0, V-1):
+    for k in range(0, K):
+      if flow_demand(network, i, k) > 0:
+        m.addConstr(gp.quicksum(outflow.get((i, k), [])) == flow_demand(network, i, k), name='ct_2_20')
+  profile_phase(m, 'ct_2_20')
+  for j in range(1, V):
+    for k in range(0, K):
+      if flow_demand(network, j, k) > 0:
+        m.addConstr(gp.quicksum(inflow.get((j, k), [])) == flow_demand(network, j, k), name='ct_2_21')
+  profile_phase(m, 'ct_2_21')
+  return x
+
+
+def solve_flow(network, mip_start=None, pruned=False, trace=False, profile=False):
 
   # Creating the model within Gurobi
   m = gp.Model('PSP', env=e)
+  start_profile(m, profile)
 
   # Run Parameters
   m.Params.LogToConsole = 0
@@ -676,64 +1777,75 @@ def solve_flow(network):
   E = list(network.arcs.keys())
   C = network.resource_availability
   S = m.addVars(V, lb = 0, vtype=GRB.CONTINUOUS, name='starting time variable')
-  f = m.addVars(V, V, C, lb  = 0, vtype=GRB.CONTINUOUS, name='resource flow variable')
-  x = m.addVars(range(0, V-1), range(1, V), vtype=GRB.BINARY, name='activity sequencing variable')
+  if pruned:
+    x = build_pruned_flow(m, network, S)
 
-  # constraints
-  for (i, j) in E:
-    m.addConstr(x[i, j] >= 1, name='ct_2_17a')
-    m.addConstr(x[i, j] <= 1, name='ct_2_17b')
+  else:
+    f = m.addVars(V, V, C, lb  = 0, vtype=GRB.CONTINUOUS, name='resource flow variable')
+    x = m.addVars(range(0, V-1), range(1, V), vtype=GRB.BINARY, name='activity sequencing variable')
+    profile_phase(m, 'variables')
 
-  for i in range(0, V-1):
-    for j in range(1, V):
-      ct_2_18_lhs = gp.LinExpr()
-      ct_2_18_lhs += S[j] - S[i] - (2*network.Tmax) * x[i, j]
-      ct_2_18_rhs = gp.LinExpr()
-      ct_2_18_rhs += network.node_dict[i].processing_time - (2*network.Tmax)
-      m.addConstr(ct_2_18_lhs >= ct_2_18_rhs, name="ct_2_18")
+    # constraints
+    for (i, j) in E:
+      m.addConstr(x[i, j] >= 1, name='ct_2_17a')
+      m.addConstr(x[i, j] <= 1, name='ct_2_17b')
+    profile_phase(m, 'ct_2_17')
 
-  for i in range(0, V-1):
-    for j in range(1, V):
-      for k in range(0, len(C)):
-        ct_2_19_lhs = gp.LinExpr()
-        if network.node_dict[i].resource_requirements[k] <= network.node_dict[j].resource_requirements[k]:
-          ct_2_19_lhs += f[i, j, k] - network.node_dict[i].resource_requirements[k] * x[i, j]
-        else:
-          ct_2_19_lhs += f[i, j, k] - network.node_dict[j].resource_requirements[k] * x[i, j]
-        m.addConstr(ct_2_19_lhs <= 0, name="ct_2_19")
-
-  for i in range(0, V-1):
-    for k in range(0, len(C)):
-      ct_2_20_lhs = gp.LinExpr()
+    for i in range(0, V-1):
       for j in range(1, V):
-        ct_2_20_lhs += f[i, j, k]
-      m.addConstr(ct_2_20_lhs >= network.node_dict[i].resource_requirements[k], name="ct_2_20a")
-      m.addConstr(ct_2_20_lhs <= network.node_dict[i].resource_requirements[k], name="ct_2_20b")
-
-  for j in range(1, V):
-    for k in range(0, len(C)):
-      ct_2_21_lhs = gp.LinExpr()
-      for i in range(0, V-1):
-        ct_2_21_lhs += f[i, j, k]
-      m.addConstr(ct_2_21_lhs >= network.node_dict[j].resource_requirements[k], name="ct_2_21a")
-      m.addConstr(ct_2_21_lhs <= network.node_dict[j].resource_requirements[k], name="ct_2_21b")
-
-  #for i in range(0, V-1):
-    #for j in range(1, V):
-      #if i == j:
-        #m.addConstr(x[i, j] >= 0, name="ct_2_22a")
-        #m.addConstr(x[i, j] <= 0, name="ct_2_22b")
+        ct_2_18_lhs = gp.LinExpr()
+        ct_2_18_lhs += S[j] - S[i] - (2*network.Tmax) * x[i, j]
+        ct_2_18_rhs = gp.LinExpr()
+        ct_2_18_rhs += network.node_dict[i].processing_time - (2*network.Tmax)
+        m.addConstr(ct_2_18_lhs >= ct_2_18_rhs, name="ct_2_18")
+    profile_phase(m, 'ct_2_18')
+
+    for i in range(0, V-1):
+      for j in range(1, V):
+        for k in range(0, len(C)):
+          ct_2_19_lhs = gp.LinExpr()
+          if flow_demand(network, i, k) <= flow_demand(network, j, k):
+            ct_2_19_lhs += f[i, j, k] - flow_demand(network, i, k) * x[i, j]
+          else:
+            ct_2_19_lhs += f[i, j, k] - flow_demand(network, j, k) * x[i, j]
+          m.addConstr(ct_2_19_lhs <= 0, name="ct_2_19")
+    profile_phase(m, 'ct_2_19')
+
+    for i in range(0, V-1):
+      for k in range(0, len(C)):
+        ct_2_20_lhs = gp.LinExpr()
+        for j in range(1, V):
+          ct_2_20_lhs += f[i, j, k]
+        m.addConstr(ct_2_20_lhs >= flow_demand(network, i, k), name="ct_2_20a")
+        m.addConstr(ct_2_20_lhs <= flow_demand(network, i, k), name="ct_2_20b")
+    profile_phase(m, 'ct_2_20')
 
-  for i in range(0, V-1):
     for j in range(1, V):
       for k in range(0, len(C)):
-        #m.addConstr(f[i, j, k] >= 0, name="ct_2_23a")
-        if i == j:
-          m.addConstr(f[i, j, k] >= 0, name="ct_2_23b") #<=
-
+        ct_2_21_lhs = gp.LinExpr()
+        for i in range(0, V-1):
+          ct_2_21_lhs += f[i, j, k]
+        m.addConstr(ct_2_21_lhs >= flow_demand(network, j, k), name="ct_2_21a")
+        m.addConstr(ct_2_21_lhs <= flow_demand(network, j, k), name="ct_2_21b")
+    profile_phase(m, 'ct_2_21')
+
+    #for i in range(0, V-1):
+      #for j in range(1, V):
+        #if i == j:
+          #m.addConstr(x[i, j] >= 0, name="ct_2_22a")
+          #m.addConstr(x[i, j] <= 0, name="ct_2_22b")
+
+    for i in range(0, V-1):
+      for j in range(1, V):
+        for k in range(0, len(C)):
+          #m.addConstr(f[i, j, k] >= 0, name="ct_2_23a")
+          if i == j:
+            m.addConstr(f[i, j, k] >= 0, name="ct_2_23b") #<=
+    profile_phase(m, 'ct_2_23')
 
   m.addConstr(S[0] >= 0, name="ct_2_24a")
   m.addConstr(S[0] <= 0, name="ct_2_24b")
+  profile_phase(m, 'ct_2_24')
 
   # OF
   m.modelSense = gp.GRB.MINIMIZE
@@ -742,12 +1854,13 @@ def solve_flow(network):
   objective = S[V-1]
 
   m.setObjective(objective)
-  m.optimize()
+  if mip_start is not None:
+    set_mip_start('flow', network, mip_start, {'S': S, 'x': x})
+  profile_phase(m, 'objective')
+  optimize(m, trace)
 
   # set makespan and node starting times
-  network.makespan = objective
-  for i in range(1, V):
-    network.node_dict[i].start = S[i]
+  extract_solution('flow', network, m, {'S': S})
 
   if m.status == GRB.OPTIMAL:
     # Output
@@ -757,8 +1870,8 @@ def solve_flow(network):
     print("With the flow model a solution was found for " + str(network.name))
     print("The best found objective value is: " + str(m.ObjVal))
     print("Solver runtime: " + str(m.runtime))
-    gap = m.Params.mipgap
-    ov = m.getObjective()
+    gap = network.result.gap
+    ov = m.ObjVal
     rt = m.runtime
 
 
@@ -772,14 +1885,614 @@ def solve_flow(network):
     print("test")
     print("Optimal solution not found")
     print("With the flow model a solution was found for " + str(network.name))
-    print("The best found objective value is: " + str(m.ObjVal))
-    print("Solver runtime: " + str(m.runtime))
-    gap = m.Params.mipgap
-    ov = m.getObjective()
-    rt = m.runtime
+    print("The best found objective value is: " + str(network.result.objective))
+    print("Solver runtime: " + str(network.result.runtime))
+    gap = network.result.gap
+    ov = network.result.objective
+    rt = network.result.runtime
 
     return ov, rt, gap
 
+"""### Capacity Scenarios
+
+To re-solve a project for different resource availabilities $R_k$ (what-if analysis), only the right-hand sides of the resource constraints (ct_2_3 for the pulse, ct_2_11 for the step formulations) change. `build_capacity_model()` builds the windowed model once and keeps the resource rows together with their resource $k$, `set_capacities()` writes the right-hand sides of a scenario.
+
+The time windows must not depend on the availabilities, so only the precedence-based windows of `compute_time_windows()` are used. The horizon is taken from a heuristic schedule for the smallest availability of every resource over all scenarios: this schedule is feasible in every scenario and is also used as MIP start. A scenario in which an activity needs more than the availability ($r_{ik} > R_k$) has no feasible schedule: it is left out of the horizon computation and its result is `None`.
+
+`solve_capacity_scenarios()` either solves the scenarios one after another, starting every solve from the previous solution (with increasing availabilities the previous solution stays feasible), or solves all scenarios at once with Gurobi's multi-scenario optimization (`multi_scenario=True`).
+"""
+
+def capacity_feasible(network, R):
+  # every activity fits into the availabilities R: r_ik <= R_k for all i and k
+  return all(network.node_dict[i].resource_requirements[k] <= R[k] for i in network.node_ids for k in R)
+
+
+def build_capacity_model(network, formulation='dt_pulse', scenarios=()):
+  # scenarios: availabilities {k: R_k}; returns the model, its variables
+  # and the resource rows as (row, k, constant): row <= R_k - constant
+  # scenarios with an activity that does not fit (r_ik > R_k) are left out of the horizon
+  scenarios = [R for R in scenarios if capacity_feasible(network, R)]
+  R_min = {k: min([network.resource_availability[k]] + [R[k] for R in scenarios]) for k in network.resource_availability}
+  R_base = network.resource_availability
+  network.resource_availability = R_min
+  try:
+    compute_time_windows(network)
+    makespan, start = set_heuristic_horizon(network)
+  finally:
+    network.resource_availability = R_base
+
+  m = gp.Model('PSP', env=e)
+  m.Params.LogToConsole = 0
+  m.Params.timelimit = 30
+  V = len(network.node_ids)
+  H = int(network.Tmax)
+  resource_rows = []
+  if formulation in ('dt_pulse', 'ddt_pulse'):
+    K = len(network.resource_availability)
+    columns = window_columns(network, H, windowed=True)
+    x = m.addMVar(int((columns >= 0).sum()), vtype=GRB.BINARY, name='pulse variable')
+    row_ids = {}
+    for (name, A, sense, b) in build_pulse_matrices(network, H, disaggregated=(formulation == 'ddt_pulse'), windowed=True, row_ids=row_ids):
+      rows = m.addMConstr(A, x, sense, b, name=name)
+      if name == 'ct_2_3':
+        m.update()
+        resource_rows = [(row, int(k), 0) for row, k in zip(rows.tolist(), row_ids[name] % K)]
+    objective = matrix_start(x, columns, V-1)
+    set_mip_start('pulse', network, start, {'x': x, 'columns': columns})
+    variables = x.tolist()
+  elif formulation in ('dt_step', 'ddt_step'):
+    eta = build_windowed_step(m, network, H, disaggregated=(formulation == 'ddt_step'), resource_rows=resource_rows)
+    objective = step_start(eta, network, V-1)
+    set_mip_start('step', network, start, {'eta': eta})
+    variables = list(eta.values())
+  else:
+    raise ValueError("no capacity model for formulation '{}'".format(formulation))
+
+  m.modelSense = GRB.MINIMIZE
+  m.setObjective(objective)
+  m.update()
+  return m, variables, resource_rows
+
+
+def set_capacities(m, resource_rows, R, scenario=None):
+  # right-hand sides R_k - constant, of the base model or of a scenario of the multi-scenario model
+  rows = [row for (row, k, constant) in resource_rows]
+  rhs = [R[k] - constant for (row, k, constant) in resource_rows]
+  if scenario is None:
+    m.setAttr('RHS', rows, rhs)
+  else:
+    m.Params.ScenarioNumber = scenario
+    m.setAttr('ScenNRHS', rows, rhs)
+
+
+def solve_capacity_scenarios(network, scenarios, formulation='dt_pulse', multi_scenario=False):
+  # one (objective value, runtime, gap) per scenario, None if no solution was found
+  # or if an activity needs more than the availability of a resource (infeasible without solving)
+  feasible = [capacity_feasible(network, R) for R in scenarios]
+  for s in range(0, len(scenarios)):
+    if not feasible[s]:
+      print("Scenario {} of {} is infeasible: an activity needs more than the availability".format(s, network.name))
+  m, variables, resource_rows = build_capacity_model(network, formulation, scenarios)
+  results = [None] * len(scenarios)
+
+  if multi_scenario:
+    solved = [s for s in range(0, len(scenarios)) if feasible[s]]
+    if not solved:
+      return results
+    set_capacities(m, resource_rows, network.resource_availability)
+    m.NumScenarios = len(solved)
+    for n, s in enumerate(solved):
+      set_capacities(m, resource_rows, scenarios[s], scenario=n)
+    m.optimize()
+    for n, s in enumerate(solved):
+      m.Params.ScenarioNumber = n
+      if m.SolCount == 0 or m.ScenNObjVal >= GRB.INFINITY:
+        continue
+      gap = abs(m.ScenNObjVal - m.ScenNObjBound) / max(abs(m.ScenNObjVal), 1e-10)
+      results[s] = (m.ScenNObjVal, m.runtime, gap)
+      print("Scenario {} of {} with the {}: objective value {}".format(s, network.name, formulation, m.ScenNObjVal))
+    return results
+
+  for s, R in enumerate(scenarios):
+    if not feasible[s]:
+      continue
+    set_capacities(m, resource_rows, R)
+    m.optimize()
+    if m.SolCount == 0:
+      continue
+    results[s] = (m.ObjVal, m.runtime, m.MIPGap)
+    print("Scenario {} of {} with the {}: objective value {}, runtime {}".format(s, network.name, formulation, m.ObjVal, m.runtime))
+    # warm start of the next scenario
+    m.setAttr('Start', variables, m.getAttr('X', variables))
+  return results
+
+"""### Lazy Resource Constraints
+
+On loosely constrained instances, only a few of the resource rows (ct_2_3 in the pulse, ct_2_11 in the step formulations) ever bind. `solve_lazy_resources()` builds the windowed model of a discrete formulation with all other rows, but keeps the resource rows as a sparse matrix $A x \leq b$ outside of the model. Only a seed set is added up front: the rows $(t, k)$ in which the earliest start schedule exceeds $R_k$. The other rows are added when they are violated...
+* in an LP cut loop (`lp_rounds > 0`): the LP relaxation is solved, and its violated rows are added until no row is violated or the rounds are used up,
+* in the callback `separate_resources()`: every new incumbent (MIPSOL) is checked, and its violated rows are added as lazy constraints with `cbLazy()`.
+
+The heuristic schedule is the MIP start. The report shows how many resource rows were needed compared with the full model.
+"""
+
+def earliest_start_overloads(network, H):
+  # periods and resources (t, k) in which the earliest start schedule exceeds R_k
+  K = len(network.resource_availability)
+  usage = np.zeros((H, K))
+  for i in network.node_ids:
+    node = network.node_dict[i]
+    usage[node.est:min(node.est + node.processing_time, H)] += node.resource_requirements
+  R = np.array([network.resource_availability[k] for k in range(0, K)])
+  return {(int(t), int(k)) for (t, k) in zip(*np.nonzero(usage > R))}
+
+
+def resource_row(m, row):
+  # row of m._A as expression over m._variables
+  begin, end = m._A.indptr[row], m._A.indptr[row+1]
+  return gp.LinExpr(m._A.data[begin:end].tolist(), [m._variables[c] for c in m._A.indices[begin:end]])
+
+
+def violated_rows(m, values):
+  # resource rows violated by the variable values that are not in the model yet
+  lhs = m._A @ values
+  return [int(row) for row in np.flatnonzero(lhs > m._rhs + 1e-6) if row not in m._added]
+
+
+def separate_resources(model, where):
+  # Gurobi callback, adds the resource rows violated by a new incumbent as lazy constraints
+  if model._trajectory is not None:
+    record_trajectory(model, where)
+  if where != GRB.Callback.MIPSOL:
+    return
+  for row in violated_rows(model, np.array(model.cbGetSolution(model._variables))):
+    model.cbLazy(resource_row(model, row) <= model._rhs[row])
+    model._added[row] = 'lazy'
+
+
+def solve_lazy_resources(network, formulation='dt_pulse', lp_rounds=0, trace=False, report=None):
+  # report (dict): receives the number of resource rows of the full model and of the rows added as seed, LP cut or lazy constraint
+  compute_time_windows(network)
+  makespan, start = set_heuristic_horizon(network)
+
+  m = gp.Model('PSP', env=e)
+  m.Params.LogToConsole = 0
+  m.Params.timelimit = 30
+  V = len(network.node_ids)
+  K = len(network.resource_availability)
+  H = int(network.Tmax)
+  if formulation in ('dt_pulse', 'ddt_pulse'):
+    columns = window_columns(network, H, windowed=True)
+    x = m.addMVar(int((columns >= 0).sum()), vtype=GRB.BINARY, name='pulse variable')
+    row_ids = {}
+    for (name, A, sense, b) in build_pulse_matrices(network, H, disaggregated=(formulation == 'ddt_pulse'), windowed=True, row_ids=row_ids):
+      if name == 'ct_2_3':
+        keys, A_resource, rhs = [(int(row // K), int(row % K)) for row in row_ids[name]], A, b
+      else:
+        m.addMConstr(A, x, sense, b, name=name)
+    objective = matrix_start(x, columns, V-1)
+    kind, variables, name = 'pulse', {'x': x, 'columns': columns}, 'ct_2_3'
+  elif formulation in ('dt_step', 'ddt_step'):
+    terms = {}
+    eta = build_windowed_step(m, network, H, disaggregated=(formulation == 'ddt_step'), resource_terms=terms)
+    m.update()
+    keys = sorted(key for key in terms if len(terms[key][1]) > 0)
+    rows = np.array([n for n, key in enumerate(keys) for v in terms[key][1]], dtype=int)
+    cols = np.array([v.index for key in keys for v in terms[key][1]], dtype=int)
+    data = np.array([c for key in keys for c in terms[key][0]], dtype=float)
+    A_resource = sp.csr_matrix((data, (rows, cols)), shape=(len(keys), m.NumVars))
+    rhs = np.array([network.resource_availability[k] - terms[t, k][2][0] for (t, k) in keys], dtype=float)
+    objective = step_start(eta, network, V-1)
+    kind, variables, name = 'step', {'eta': eta}, 'ct_2_11'
+  else:
+    raise ValueError("no lazy model for formulation '{}'".format(formulation))
+
+  m.modelSense = GRB.MINIMIZE
+  m.setObjective(objective)
+  set_mip_start(kind, network, start, variables)
+  m.update()
+  m._variables, m._A, m._rhs, m._added = m.getVars(), sp.csr_matrix(A_resource), rhs, {}
+
+  # seed: rows overloaded by the earliest start schedule
+  seed = earliest_start_overloads(network, H)
+  for row in range(0, len(keys)):
+    if keys[row] in seed:
+      m.addLConstr(resource_row(m, row), GRB.LESS_EQUAL, rhs[row], name=name)
+      m._added[row] = 'seed'
+
+  # LP cut loop on the relaxation
+  if lp_rounds > 0:
+    vtypes = m.getAttr('VType', m._variables)
+    m.setAttr('VType', m._variables, [GRB.CONTINUOUS] * len(m._variables))
+    for round in range(0, lp_rounds):
+      m.optimize()
+      if m.status != GRB.OPTIMAL:
+        break
+      violated = violated_rows(m, np.array(m.getAttr('X', m._variables)))
+      if not violated:
+        break
+      for row in violated:
+        m.addLConstr(resource_row(m, row), GRB.LESS_EQUAL, rhs[row], name=name)
+        m._added[row] = 'lp'
+    m.setAttr('VType', m._variables, vtypes)
+
+  m.Params.LazyConstraints = 1
+  optimize(m, trace, callback=separate_resources)
+  extract_solution(kind, network, m, variables)
+
+  counts = {'full': len(keys), 'needed': len(m._added)}
+  for how in ('seed', 'lp', 'lazy'):
+    counts[how] = sum(1 for v in m._added.values() if v == how)
+  if report is not None:
+    report.update(counts)
+  print("With the {} and lazy resource rows a solution was found for {}".format(formulation, network.name))
+  print("The best found objective value is: " + str(network.result.objective))
+  print("Solver runtime: " + str(m.runtime))
+  print("Resource rows: {} of {} needed ({} seed, {} LP cuts, {} lazy)".format(
+      counts['needed'], counts['full'], counts['seed'], counts['lp'], counts['lazy']))
+  return network.result.objective, m.runtime, network.result.gap
+
+"""### Coarse-to-Fine Time Grid
+
+The size of the discrete-time models grows with the horizon, so instances with long durations become large on the unit time grid. `solve_coarse_to_fine()` first solves the model on time buckets of width $g$: `scale_network()` rounds the durations up to $\lceil p_i / g \rceil$ buckets. A schedule of the scaled network, multiplied by $g$, is then also feasible on every finer grid whose width divides $g$. Every level is solved with the windowed model of the chosen `solve()` method and starts from the schedule of the previous level (or the heuristic schedule, if that is better). This schedule gives the horizon, so `compute_time_windows()` narrows $ES_i$ and $LS_i$ for the next level. With `radius`, the windows are additionally restricted to $\pm$ `radius` buckets around the previous start times. The last level is then only a heuristic.
+
+Only the bound of the unit grid ($g = 1$) is a lower bound of the original problem.
+"""
+
+def scale_network(network, g):
+  # durations rounded up to buckets of width g, a schedule of the scaled network times g is feasible for network
+  V = len(network.node_ids)
+  nodes = network.node_dict
+  p = [-(-nodes[i].processing_time // g) for i in range(0, V)]
+  r = [nodes[i].resource_requirements for i in range(0, V)]
+  successors = [nodes[i].successors for i in range(0, V)]
+  R = [network.resource_availability[k] for k in range(0, len(network.resource_availability))]
+  return build_network('{} (g={})'.format(network.name, g), p, r, successors, R)
+
+
+def solve_coarse_to_fine(network, formulation='dt_pulse', grids=(8, 4, 2, 1), radius=None, options=None, levels=None):
+  # grids: bucket widths, every width divides the previous one; levels (list): receives the result of every level
+  solve = {'dt_pulse': solve_dt_pulse, 'ddt_pulse': solve_ddt_pulse, 'dt_step': solve_dt_step, 'ddt_step': solve_ddt_step}[formulation]
+  V = len(network.node_ids)
+  start, g_previous = None, None
+  runtime = 0
+  for g in grids:
+    if g_previous is not None and g_previous % g != 0:
+      raise ValueError('grid {} does not divide grid {}'.format(g, g_previous))
+    scaled = network if g == 1 else scale_network(network, g)
+
+    # best schedule so far in buckets of width g, or the heuristic schedule
+    makespan, heuristic = set_heuristic_horizon(scaled)
+    if start is not None:
+      start = [s * (g_previous // g) for s in start]
+      if start[V-1] <= makespan:
+        scaled.Tmax = min(scaled.Tmax, start[V-1] + 1)
+        compute_time_windows(scaled)
+      else:
+        start = heuristic
+    else:
+      start = heuristic
+    if radius is not None and g_previous is not None:
+      for i in range(0, V):
+        node = scaled.node_dict[i]
+        node.est, node.lst = max(node.est, start[i] - radius), min(node.lst, start[i] + radius)
+
+    solve(scaled, windowed=True, mip_start=start, **(options or {}))
+    if scaled.result.objective is not None:
+      start = [scaled.node_dict[i].start for i in range(0, V)]
+    runtime += scaled.result.runtime
+    if levels is not None:
+      levels.append({'grid': g, 'makespan': start[V-1] * g, 'status': scaled.result.status,
+                     'bound': scaled.result.bound if g == 1 else None, 'runtime': scaled.result.runtime, 'size': scaled.result.size})
+    g_previous = g
+
+  # schedule of the finest level on the unit grid
+  for i in range(0, V):
+    network.node_dict[i].start = start[i] * g_previous
+  network.makespan = start[V-1] * g_previous
+  print("Coarse-to-fine {} for {}: makespan {} after grids {}, total solver runtime {}".format(
+      formulation, network.name, network.makespan, tuple(grids), runtime))
+  return network.makespan, runtime, network.result.gap if g_previous == 1 else None
+
+"""### Destructive Lower Bounds
+
+The MIP bound of a run only improves slowly. `destructive_lower_bound()` proves lower bounds by refuting deadlines (Klein and Scholl 1999): a candidate makespan $T$ below the heuristic upper bound is set as deadline $T^{max} = T$, and `deadline_test()` tries to show that no schedule meets it...
+* `compute_time_windows()` against the deadline: $ES_n > T$,
+* the resource-based tests of `tighten_time_windows()` (timetabling, energetic reasoning) find an empty window or an overloaded interval,
+* optionally (`lp=True`): the LP relaxation of the windowed pulse model has no solution within the new time windows.
+
+Every refuted $T$ proves the lower bound $T+1$. The deadlines are tested from the resource-based lower bound upwards (`search='incremental'`) or by bisection between lower and upper bound (`search='binary'`). The LP is built once on the horizon of the upper bound. For every deadline, only the upper bounds of the pulse variables are changed to the new time windows, so Gurobi can warm start from the previous LP.
+"""
+
+def deadline_lp(network, H, disaggregated=True):
+  # LP relaxation of the windowed pulse model on the horizon H, deadlines are set by the bounds of x
+  m = gp.Model('LP', env=e)
+  m.Params.LogToConsole = 0
+  columns = window_columns(network, H, windowed=True)
+  x = m.addMVar(int((columns >= 0).sum()), lb=0, ub=1, vtype=GRB.CONTINUOUS, name='pulse variable')
+  for (name, A, sense, b) in build_pulse_matrices(network, H, disaggregated=disaggregated, windowed=True):
+    m.addMConstr(A, x, sense, b, name=name)
+  m.setObjective(matrix_start(x, columns, len(network.node_ids)-1), GRB.MINIMIZE)
+  return m, x, columns
+
+
+def deadline_test(network, T, lp=None):
+  # refutes the deadline T by 'precedence', 'resources' or 'lp', None if T could not be refuted
+  V = len(network.node_ids)
+  network.Tmax = T
+  compute_time_windows(network)
+  if network.node_dict[V-1].est > T:
+    return 'precedence'
+  if not tighten_time_windows(network)['feasible']:
+    return 'resources'
+  if lp is not None:
+    m, x, columns = lp
+    inside = np.zeros(columns.shape, dtype=bool)
+    for i in range(0, V):
+      inside[i, network.node_dict[i].est:network.node_dict[i].lst+1] = True
+    x.UB = inside[columns >= 0].astype(float)
+    m.optimize()
+    if m.status in (GRB.INFEASIBLE, GRB.INF_OR_UNBD):
+      return 'lp'
+  return None
+
+
+def destructive_lower_bound(network, search='binary', lp=False, disaggregated=True, log=None):
+  # returns the lower and the heuristic upper bound, log (list): receives (T, refuted by) for every tested deadline
+  Tmax = network.Tmax
+  compute_time_windows(network)
+  upper, start, rule, scheme = heuristic_upper_bound(network)
+  lower = resource_lower_bound(network)
+  model = None
+  if lp and lower < upper:
+    network.Tmax = upper + 1
+    compute_time_windows(network)
+    model = deadline_lp(network, upper + 1, disaggregated)
+
+  tested = []
+  def refuted(T):
+    how = deadline_test(network, T, model)
+    tested.append((T, how))
+    return how is not None
+
+  if search == 'binary':
+    # all T < lower are refuted, upper is feasible
+    hi = upper
+    while lower < hi:
+      T = (lower + hi) // 2
+      if refuted(T):
+        lower = T + 1
+      else:
+        hi = T
+  elif search == 'incremental':
+    while lower < upper and refuted(lower):
+      lower += 1
+  else:
+    raise ValueError("unknown search '{}'".format(search))
+
+  network.Tmax = Tmax
+  compute_time_windows(network)
+  if log is not None:
+    log.extend(tested)
+  print("Destructive lower bound for {}: {} (heuristic upper bound {}, {} deadlines tested)".format(network.name, lower, upper, len(tested)))
+  return lower, upper
+
+"""### Branch and Bound without a Solver
+
+All MIP formulations above need a Gurobi license. `solve_branch_and_bound()` is an exact method which works directly on the network, so that schedules can also be computed without a license. It is a depth-first branch-and-bound over the *precedence tree* (Patterson et al. 1989, Sprecher 2000), searched with an explicit stack, so that the depth is not limited by Python's recursion limit. On every level, one eligible activity (all predecessors scheduled) is started at its earliest precedence- and resource-feasible time that is not before the start of the previously scheduled activity. This enumerates all active schedules, and the best heuristic schedule is the initial upper bound.
+
+A partial schedule is discarded if...
+* its lower bound is not smaller than the best makespan found so far. The bound is the critical path of the unscheduled activities (heads from the partial schedule, tails = longest paths to the end) and, for every resource, the remaining work after the current start time divided by $R_k$.
+* it starts an activity at the same time as the previous one with a smaller index (*single enumeration rule*, only if the activities are numbered topologically). The same schedule is enumerated in the other order.
+* the same set of activities has been scheduled before with a start time $t' \leq t$ and every scheduled activity $i$ released its successors by $\max(e_i, t)$, where $e_i$ is the release time of $i$ in the current partial schedule (*cutset rule*, Demeulemeester and Herroelen 1992).
+
+The return values are the same as for the `solve()` methods. If the time limit is reached, the best schedule found so far is returned, together with the gap to the root lower bound.
+"""
+
+def solve_branch_and_bound(network, timelimit=30, trace=False):
+
+  begin = time.time()
+  V, p, r, R, usage = sgs_data(network)
+  if network.node_dict[0].lst is None:
+    compute_time_windows(network)
+  nodes = network.node_dict
+  preds, succs = network.predecessor_index, network.successor_index
+  arcs = network.arcs
+  # longest path from i to the end, release time of i (start + lag to the latest released successor)
+  tail, tail_pred = longest_paths(V, preds, lambda j, i: arcs[(i, j)], [float('-inf')] * (V-1) + [0])
+  release = [max([p[i]] + [arcs[(i, j)] for j in succs[i]]) for i in range(0, V)]
+  order = topological_order(network)
+  topological = all(i < j for (i, j) in arcs)
+  energy = (r * np.array(p)[:, None]).sum(axis=0)
+
+  makespan, start, rule, scheme = heuristic_upper_bound(network)
+  best = [makespan, list(start)]
+  root_bound = max(resource_lower_bound(network), nodes[V-1].est)
+  start = [None] * V
+  missing = [len(preds[j]) for j in range(0, V)]
+  cutsets = {}
+  stats = {'nodes': 0, 'timeout': False}
+  trajectory = [(time.time() - begin, best[0], root_bound, 0)] if trace else None
+
+  def lower_bound(t, remaining):
+    head = {}
+    bound = t
+    for j in order:
+      if start[j] is not None:
+        continue
+      head[j] = max([t, nodes[j].est] + [(start[i] if start[i] is not None else head[i]) + arcs[(i, j)] for i in preds[j]])
+      bound = max(bound, head[j] + tail[j])
+    work = usage[t:].sum(axis=0) + remaining
+    return max([bound] + [t + math.ceil(work[k] / R[k]) for k in range(0, len(R))])
+
+  def dominated(mask, t):
+    released = [start[i] + release[i] for i in range(0, V) if (mask >> i) & 1]
+    for t_stored, released_stored in cutsets.get(mask, []):
+      if t_stored <= t and all(a <= max(b, t) for a, b in zip(released_stored, released)):
+        return True
+    cutsets.setdefault(mask, []).append((t, released))
+    return False
+
+  def enter(t_last, last, mask, eligible, remaining):
+    # node of the precedence tree: None if it is a complete schedule or pruned, otherwise its frame
+    # [t_last, last, mask, eligible, remaining, candidates, scheduled child (j, t) to undo]
+    stats['nodes'] += 1
+    if stats['nodes'] % 1000 == 0 and time.time() - begin > timelimit:
+      stats['timeout'] = True
+    if stats['timeout']:
+      return None
+    if not eligible:
+      if start[V-1] < best[0]:
+        best[0], best[1] = start[V-1], list(start)
+        if trace:
+          trajectory.append((time.time() - begin, best[0], root_bound, stats['nodes']))
+      return None
+    if lower_bound(t_last, remaining) >= best[0] or dominated(mask, t_last):
+      return None
+    return [t_last, last, mask, eligible, remaining, iter(sorted(eligible, key=lambda j: nodes[j].lft)), None]
+
+  def undo(j, t):
+    for k in succs[j]:
+      missing[k] += 1
+    usage[t:t+p[j]] -= r[j]
+    start[j] = None
+
+  # depth-first search with an explicit stack, one frame per scheduled activity (no recursion limit)
+  stack = []
+  if best[0] > root_bound:
+    stack.append(enter(0, -1, 0, [j for j in range(0, V) if missing[j] == 0], energy))
+  while stack and stack[-1] is not None and not stats['timeout']:
+    frame = stack[-1]
+    t_last, last, mask, eligible, remaining, candidates, child = frame
+    if child is not None:
+      undo(*child)
+      frame[6] = None
+    for j in candidates:
+      t = max([t_last] + [start[i] + arcs[(i, j)] for i in preds[j]])
+      while np.any(usage[t:t+p[j]] + r[j] > R):
+        t += 1
+      if topological and t == t_last and j < last:
+        continue
+      if t + tail[j] >= best[0]:
+        continue
+      start[j] = t
+      usage[t:t+p[j]] += r[j]
+      released = []
+      for k in succs[j]:
+        missing[k] -= 1
+        if missing[k] == 0:
+          released.append(k)
+      frame[6] = (j, t)
+      node = enter(t, j, mask | (1 << j), [i for i in eligible if i != j] + released, remaining - r[j] * p[j])
+      if node is not None:
+        stack.append(node)
+      break
+    else:
+      stack.pop()
+
+  rt = time.time() - begin
+  ov = best[0]
+  gap = (ov - root_bound) / ov if stats['timeout'] and ov > 0 else 0
+
+  # set makespan and node starting times
+  network.makespan = ov
+  for i in range(0, V):
+    nodes[i].start = best[1][i]
+  network.result = Result('branch_and_bound', 'time_limit' if stats['timeout'] else 'optimal', ov, ov*(1-gap), gap, rt, trajectory)
+
+  if not stats['timeout']:
+    print("With the branch-and-bound a solution was found for " + str(network.name))
+  else:
+    print("Optimal solution not found")
+    print("With the branch-and-bound a solution was found for " + str(network.name))
+  print("The best found objective value is: " + str(ov))
+  print("Solver runtime: " + str(rt))
+  return ov, rt, gap
+
+"""### Constraint Programming (CP-SAT)
+
+The time-indexed models grow with the horizon. A constraint programming model needs one interval variable per activity instead: `solve_cp_sat()` translates the network into an OR-Tools CP-SAT model with the start times $S_i \in [ES_i, LS_i]$ as domains, the time lags as linear constraints and one `AddCumulative()` constraint per resource. CP-SAT searches with several workers in parallel (`workers`). A `mip_start` is passed as solution hint. OR-Tools is optional: without it, the Gurobi formulations work as before and `cp_sat` is not offered in the computational study.
+"""
+
+try:
+  from ortools.sat.python import cp_model
+except ImportError:
+  cp_model = None
+
+if cp_model is not None:
+  class TrajectoryCallback(cp_model.CpSolverSolutionCallback):
+      # records (time, incumbent, bound, branches) for every improving solution of CP-SAT
+
+      def __init__(self):
+          cp_model.CpSolverSolutionCallback.__init__(self)
+          self.trajectory = []
+
+
+      def on_solution_callback(self):
+          self.trajectory.append((self.WallTime(), self.ObjectiveValue(), self.BestObjectiveBound(), self.NumBranches()))
+
+
+
+def solve_cp_sat(network, mip_start=None, workers=8, timelimit=30, trace=False):
+
+  if cp_model is None:
+    raise ImportError("solve_cp_sat() needs OR-Tools (pip install ortools)")
+  if network.node_dict[0].lst is None:
+    compute_time_windows(network)
+  V = len(network.node_ids)
+  K = len(network.resource_availability)
+  model = cp_model.CpModel()
+
+  # start time variables on the time windows, intervals of the activities with a duration
+  S = [model.NewIntVar(int(network.node_dict[i].est), int(network.node_dict[i].lst), 'S_{}'.format(i)) for i in range(0, V)]
+  intervals = {}
+  for i in range(0, V):
+    p = int(network.node_dict[i].processing_time)
+    if p > 0:
+      intervals[i] = model.NewIntervalVar(S[i], p, S[i] + p, 'I_{}'.format(i))
+
+  for (i, j), d_ij in network.arcs.items():
+    model.Add(S[j] >= S[i] + int(d_ij))
+
+  for k in range(0, K):
+    demands = {i: int(network.node_dict[i].resource_requirements[k]) for i in intervals}
+    users = [i for i in intervals if demands[i] > 0]
+    model.AddCumulative([intervals[i] for i in users], [demands[i] for i in users], int(network.resource_availability[k]))
+
+  model.Minimize(S[V-1])
+  if mip_start is not None:
+    for i in range(0, V):
+      model.AddHint(S[i], int(mip_start[i]))
+
+  solver = cp_model.CpSolver()
+  solver.parameters.max_time_in_seconds = timelimit
+  solver.parameters.num_workers = workers
+  callback = TrajectoryCallback() if trace else None
+  status = solver.Solve(model, callback)
+  rt = solver.WallTime()
+
+  network.result = Result('cp_sat', 'optimal' if status == cp_model.OPTIMAL else solver.StatusName(status).lower(), runtime=rt,
+                          trajectory=callback.trajectory if trace else None)
+  if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+    print("No solution found with CP-SAT for " + str(network.name))
+    return None, rt, None
+
+  # set makespan and node starting times
+  ov = solver.ObjectiveValue()
+  network.makespan = int(ov)
+  for i in range(0, V):
+    network.node_dict[i].start = solver.Value(S[i])
+
+  if status == cp_model.OPTIMAL:
+    gap = 0
+  else:
+    print("Optimal solution not found")
+    gap = (ov - solver.BestObjectiveBound()) / ov if ov > 0 else 0
+  network.result.objective, network.result.bound, network.result.gap = ov, solver.BestObjectiveBound(), gap
+  print("With CP-SAT a solution was found for " + str(network.name))
+  print("The best found objective value is: " + str(ov))
+  print("Solver runtime: " + str(rt))
+  return ov, rt, gap
+
 """## 2 Computational Study
 Now, you can finally test your implementations! 🙃
 
@@ -809,61 +2522,310 @@ $j^{i}_{s}$ || Activity index of the s-th successor of activity $i$
 ### 2.1 Read Data
 
 **[2 points]**
+
+The workbook is opened in read-only mode and every instance sheet is read row by row (`iter_rows`). `read_workbook()` yields the networks one after another, so an instance can be used before the next one is read. `read_psplib()` does the same for the original single-mode PSPLIB files (`.sm`, e.g. the J30 to J120 sets).
+
+`cached_instances()` stores the parsed instances together with their time windows as NumPy arrays next to the input file. The cache is keyed by the path and a hash of the file content, so it is rebuilt automatically after the workbook changes, and the outdated cache of the same file is removed (other files may share `cache_root`). A later run memory-maps the arrays and only reads the instances it asks for (`names`).
 """
 
-# read data from excel using pandas
+# read data from excel (or from PSPLIB files)
 
 from openpyxl import load_workbook
 import pandas as pd
+import os
+from itertools import islice
+
+
+def build_network(name, p, r, successors, R):
+  # p: durations, r: resource requirements, successors: successor lists (node ids from 0), R: availabilities
+  node_dict = {i: Node(index=i, successors=list(successors[i]), processing_time=p[i], resource_requirements=list(r[i])) for i in range(0, len(p))}
+  time_lags = {(i, j): p[i] for i in range(0, len(p)) for j in successors[i]}
+  return Network(name=name, node_dict=node_dict, arcs=time_lags, k=len(R), C=dict(enumerate(R)))
+
+
+def network_from_rows(name, rows):
+  # rows of an instance sheet without the title row: (n, k), (R_1, ..., R_k), then one row per activity
+  n, k = (int(v) for v in next(rows)[:2])
+  R = [int(v) for v in next(rows)[:k]]
+  p, r, successors = [], [], []
+  for row in islice(rows, n):
+    p.append(int(row[0]))
+    r.append([int(v) for v in row[1:k+1]])
+    s = int(row[k+1])
+    successors.append([int(v) - 1 for v in row[k+2:k+2+s]]) # -1 bc node notation from 0 to n-1
+  return build_network(name, p, r, successors, R)
+
+
+def read_workbook(path, sheets=None):
+  # yields one network per instance sheet, the sheets are read row by row
+  workbook = load_workbook(path, read_only=True, data_only=True)
+  try:
+    for sheet in workbook.worksheets:
+      if sheet.title == 'Results' or (sheets is not None and sheet.title not in sheets):
+        continue
+      yield network_from_rows(sheet.title, sheet.iter_rows(min_row=2, values_only=True))
+  finally:
+    workbook.close()
+
+
+def read_sm(path):
+  # single-mode PSPLIB file (j30.sm, ..., j120.sm), read line by line
+  p, r, successors, R = [], [], [], []
+  section = None
+  with open(path) as f:
+    for line in f:
+      if line.startswith('PRECEDENCE RELATIONS'):
+        section = 'precedence'
+      elif line.startswith('REQUESTS/DURATIONS'):
+        section = 'requests'
+      elif line.startswith('RESOURCEAVAILABILITIES'):
+        section = 'availabilities'
+      elif line.startswith('*'):
+        section = None
+      else:
+        fields = line.split()
+        if section is None or not fields or not fields[0].isdigit():
+          continue
+        values = [int(v) for v in fields]
+        if section == 'precedence':
+          # jobnr., #modes, #successors, successors (job numbers from 1)
+          successors.append([j - 1 for j in values[3:3+values[2]]])
+        elif section == 'requests':
+          # jobnr., mode, duration, requests
+          p.append(values[2])
+          r.append(values[3:])
+        else:
+          R = values
+  return build_network(os.path.splitext(os.path.basename(path))[0], p, r, successors, R)
+
+
+def read_psplib(paths):
+  # yields one network per .sm file, e.g. read_psplib(sorted(glob.glob('j30.sm/*.sm')))
+  for path in paths:
+    yield read_sm(path)
+
+
+import hashlib
+import re
+import shutil
+
+CACHE_ARRAYS = ('p', 'r', 'R', 'est', 'lst', 'eft', 'lft', 'succ_indptr', 'succ_indices', 'succ_lags')
+CACHE_VERSION = 1
+
+
+def file_hash(path):
+  digest = hashlib.sha256()
+  with open(path, 'rb') as f:
+    for chunk in iter(lambda: f.read(1 << 20), b''):
+      digest.update(chunk)
+  return digest.hexdigest()
+
+
+def write_instance_cache(networks, directory):
+  # the arrays of all instances are concatenated into one .npy file per array, index.json holds the slices
+  parts = {a: [] for a in CACHE_ARRAYS}
+  offsets = dict.fromkeys(CACHE_ARRAYS, 0)
+  index = {}
+  for network in networks:
+    compiled = network.compile()
+    index[compiled.name] = {'Tmax': int(compiled.Tmax), 'K': len(compiled.R), 'slices': {}}
+    for a in CACHE_ARRAYS:
+      values = getattr(compiled, a).ravel()
+      index[compiled.name]['slices'][a] = (offsets[a], offsets[a] + len(values))
+      offsets[a] += len(values)
+      parts[a].append(values)
+
+  os.makedirs(directory, exist_ok=True)
+  for a in CACHE_ARRAYS:
+    np.save(os.path.join(directory, a + '.npy'), np.concatenate(parts[a]))
+  # written last, a cache without index.json is incomplete
+  with open(os.path.join(directory, 'index.json'), 'w') as f:
+    json.dump(index, f)
+
+
+def load_instance_cache(directory, names=None):
+  # the arrays are memory-mapped, only the slices of the requested instances are read
+  with open(os.path.join(directory, 'index.json')) as f:
+    index = json.load(f)
+  arrays = {a: np.load(os.path.join(directory, a + '.npy'), mmap_mode='r') for a in CACHE_ARRAYS}
+  instances = {}
+  for name in (index if names is None else names):
+    entry = index[name]
+    values = {a: np.array(arrays[a][slice(*entry['slices'][a])]) for a in CACHE_ARRAYS}
+    values['r'] = values['r'].reshape(-1, entry['K'])
+    instances[name] = CompiledNetwork.from_arrays(name, entry['Tmax'], **values).to_network()
+  return instances
+
+
+def cached_instances(path, names=None, reader=read_workbook, cache_root=None):
+  # networks with time windows, parsed once per content of the file at path (<path>.cache/<source>-<hash>-v<version>/),
+  # a changed file gets a new cache and only the outdated caches of the same file are removed
+  cache_root = cache_root or path + '.cache'
+  source = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+  entry = '{}-{}-v{}'.format(source, file_hash(path), CACHE_VERSION)
+  directory = os.path.join(cache_root, entry)
+  if not os.path.exists(os.path.join(directory, 'index.json')):
+    if os.path.isdir(cache_root):
+      for other in os.listdir(cache_root):
+        if other != entry and re.fullmatch(source + r'-[0-9a-f]{64}-v[0-9]+', other) and os.path.isdir(os.path.join(cache_root, other)):
+          shutil.rmtree(os.path.join(cache_root, other), ignore_errors=True)
+    shutil.rmtree(directory, ignore_errors=True)
+    networks = []
+    for network in reader(path):
+      compute_time_windows(network)
+      networks.append(network)
+    write_instance_cache(networks, directory)
+  return load_instance_cache(directory, names)
 
-xlsx_link = 'D:\Van\Complex Scheduling\Copy of RCPSP_data.xlsx'
-workbook = load_workbook(xlsx_link)
-Instances = {}
-
-# iterate through all sheets (instances)
-for sheet in workbook.worksheets:
-
-    # get general info first
-    sheet_name = sheet.title
-
-for sheet in workbook.worksheets[1:3]:
-
-  sheet_name = sheet.title
-
-  n = int(sheet.cell(2, 1).value)
-
-  k = int(sheet.cell(2, 2).value)
-
-  C = dict() # dict with resources (index from 0 to k-1 as key, availability as values)
-  for i in range(0, k):
-    C[i] = sheet.cell(3, i+1).value
-
-  S_n = []
-  for nn in range(0, n):
-    S_n.append(int(sheet.cell(4+nn, 6).value))
 
-  node_dict = {i: Node(index=n, successors=[], processing_time=0, resource_requirements=[] ) for i in range(0, n)}
+xlsx_link = 'D:\Van\Complex Scheduling\Copy of RCPSP_data.xlsx'
+Instances = cached_instances(xlsx_link)
 
-  for nn in range(0, n):
-    for kk in range(0, k):
-      node_dict[nn].resource_requirements.append(sheet.cell(nn+4, kk+2).value)
+"""### Instance Generator
 
-  for nn in range(0, n):
-    node_dict[nn].processing_time = int(sheet.cell(4+nn, 1).value)
+For scaling studies beyond 30 activities, `generate_network()` creates instances in the style of ProGen (Kolisch et al. 1995), the generator of the PSPLIB instances, with the parameters
 
-  for nn in range(0, n):
-    for s in range(0, S_n[nn]):
-      node_dict[nn].successors.append(int(sheet.cell(nn+4, s+7).value-1)) # -1 bc node notation from 0 to 31
+* $n$: number of (real) activities, plus the dummy start and end activity,
+* network complexity $NC$: average number of arcs per activity (including the arcs of the dummy activities). The arcs are non-redundant, i.e. no arc is implied by a path of other arcs,
+* resource factor $RF$: average share of the $K$ resources an activity requires,
+* resource strength $RS$: $R_k = r^{min}_k + RS \cdot (r^{max}_k - r^{min}_k)$, with $r^{min}_k$ the largest single requirement and $r^{max}_k$ the peak requirement of the earliest start schedule,
+* the ranges of the durations and requirements.
 
-  time_lags = dict()
-  for i in range(0, n):
-    for j in range(0, len(node_dict[i].successors)):
-      time_lags[(i, node_dict[i].successors[j])] = int(node_dict[i].processing_time)
+The same seed always gives the same instance. `write_sm()` and `write_workbook()` save instances in the PSPLIB format or in the layout of the provided workbook, which can be read again with `read_psplib()` and `read_workbook()`.
+"""
 
-  Instances[sheet_name] = Network(name=sheet_name,
-                                node_dict=node_dict,
-                                arcs=time_lags,
-                                k=k, C=C)
+from openpyxl import Workbook
+
+def set_bits(b):
+  # indices of the set bits of b
+  while b:
+    low = b & -b
+    yield low.bit_length() - 1
+    b ^= low
+
+
+def generate_network(n, K=4, NC=1.5, RF=0.5, RS=0.5, durations=(1, 10), demands=(1, 10), max_start=3, max_end=3, seed=0, name=None):
+  if n < 1:
+    raise ValueError("generate_network() needs at least one activity, n = {}".format(n))
+  rng = random.Random(seed)
+  V = n + 2
+  successors = [[] for i in range(0, V)]
+  direct = [0] * V     # direct successors, bit sets
+  reach = [0] * V      # transitive successors
+  ancestors = [0] * V  # transitive predecessors
+  n_start = rng.randint(1, max(min(max_start, n-1), 1))
+  n_end = rng.randint(1, max(min(max_end, n-n_start), 1))
+  last = n - n_end # activities last+1, ..., n are end activities
+
+  def redundant(i, j):
+    # (i, j) is implied by a path, or it implies an existing arc (a, b) from a predecessor of i to a successor of j
+    if (reach[i] >> j) & 1:
+      return True
+    after = reach[j] | (1 << j)
+    return any(direct[a] & after for a in set_bits(ancestors[i] | (1 << i)))
+
+  def add(i, j):
+    successors[i].append(j)
+    direct[i] |= 1 << j
+    before, after = ancestors[i] | (1 << i), reach[j] | (1 << j)
+    for a in set_bits(before):
+      reach[a] |= after
+    for b in set_bits(after):
+      ancestors[b] |= before
+
+  # activities are numbered topologically: a predecessor for every non-start activity,
+  # a successor for every non-end activity, further arcs until NC is reached
+  for j in range(n_start+1, n+1):
+    add(rng.randint(1, min(j-1, last)), j)
+  for i in range(1, last+1):
+    for attempt in range(0, 10):
+      if successors[i]:
+        break
+      j = rng.randint(max(i+1, n_start+1), n)
+      if not redundant(i, j):
+        add(i, j)
+  arcs = sum(len(successors[i]) for i in range(1, n+1))
+  dummy_arcs = lambda: n_start + sum(1 for i in range(1, n+1) if not successors[i])
+  for attempt in range(0, 20*V):
+    # with n = 1 the only activity is start and end activity (last = 0), no arc can be added
+    if last < 1 or arcs + dummy_arcs() >= round(NC * V):
+      break
+    i = rng.randint(1, last)
+    j = rng.randint(max(i+1, n_start+1), n)
+    if not redundant(i, j):
+      add(i, j)
+      arcs += 1
+  successors[0] = list(range(1, n_start+1))
+  for i in range(1, n+1):
+    if not successors[i]:
+      successors[i] = [V-1]
+
+  # durations and requirements, every activity requires RF*K resources on average
+  p = [0] + [rng.randint(*durations) for j in range(1, n+1)] + [0]
+  r = [[0] * K]
+  for j in range(1, n+1):
+    q = int(RF * K) + (1 if rng.random() < RF * K - int(RF * K) else 0)
+    used = rng.sample(range(0, K), q)
+    r.append([rng.randint(*demands) if k in used else 0 for k in range(0, K)])
+  r.append([0] * K)
+
+  # availabilities from the resource strength
+  network = build_network(name or 'G{}_{}'.format(n, seed), p, r, successors, [max(max(r[j][k] for j in range(0, V)), 1) for k in range(0, K)])
+  compute_time_windows(network)
+  usage = np.zeros((sum(p) + 1, K))
+  for j in range(0, V):
+    usage[network.node_dict[j].est:network.node_dict[j].est + p[j]] += r[j]
+  for k in range(0, K):
+    r_min = max(r[j][k] for j in range(0, V))
+    # activities with p_j = 0 use no capacity in the earliest start schedule, but still need R_k >= r_jk
+    r_max = max(int(usage[:, k].max()), r_min)
+    network.resource_availability[k] = max(r_min + round(RS * (r_max - r_min)), 1)
+  return network
+
+
+def write_sm(network, path):
+  # single-mode PSPLIB format, see read_sm()
+  V = len(network.node_ids)
+  K = len(network.resource_availability)
+  nodes = network.node_dict
+  line = '*' * 72
+  with open(path, 'w') as f:
+    f.write(line + '\n')
+    f.write('file with basedata            : {}.bas\n'.format(network.name))
+    f.write(line + '\n')
+    f.write('projects                      :  1\n')
+    f.write('jobs (incl. supersource/sink ):  {}\n'.format(V))
+    f.write('horizon                       :  {}\n'.format(sum(nodes[i].processing_time for i in range(0, V))))
+    f.write('RESOURCES\n  - renewable                 :  {}   R\n  - nonrenewable              :  0   N\n  - doubly constrained        :  0   D\n'.format(K))
+    f.write(line + '\n')
+    f.write('PRECEDENCE RELATIONS:\njobnr.    #modes  #successors   successors\n')
+    for i in range(0, V):
+      f.write('  {:>4}        1        {:>3}   {}\n'.format(i+1, len(nodes[i].successors), '  '.join(str(j+1) for j in nodes[i].successors)))
+    f.write(line + '\n')
+    f.write('REQUESTS/DURATIONS:\njobnr. mode duration  {}\n'.format('  '.join('R {}'.format(k+1) for k in range(0, K))))
+    f.write('-' * 72 + '\n')
+    for i in range(0, V):
+      f.write('  {:>4}      1     {:>3}   {}\n'.format(i+1, nodes[i].processing_time, '  '.join('{:>3}'.format(int(v)) for v in nodes[i].resource_requirements)))
+    f.write(line + '\n')
+    f.write('RESOURCEAVAILABILITIES:\n  {}\n'.format('  '.join('R {}'.format(k+1) for k in range(0, K))))
+    f.write('  {}\n'.format('  '.join('{:>3}'.format(int(network.resource_availability[k])) for k in range(0, K))))
+    f.write(line + '\n')
+
+
+def write_workbook(networks, path):
+  # one sheet per network in the layout of the provided workbook, see read_workbook()
+  workbook = Workbook(write_only=True)
+  for network in networks:
+    V = len(network.node_ids)
+    K = len(network.resource_availability)
+    sheet = workbook.create_sheet(network.name)
+    sheet.append(['Input data:'])
+    sheet.append([V, K])
+    sheet.append([network.resource_availability[k] for k in range(0, K)])
+    for i in range(0, V):
+      node = network.node_dict[i]
+      sheet.append([node.processing_time] + list(node.resource_requirements) + [len(node.successors)] + [j+1 for j in node.successors])
+  workbook.save(path)
 
 """### 2.2 Results
 
@@ -875,18 +2837,115 @@ Make sure to also fill in your hardware specifications and to compute the "Gap t
 
 
 **[3 points]**
-"""
-
-for inst in Instances:
-  network = Instances[inst]
 
-  compute_time_windows(network)
+The (instance, formulation) runs are independent, so `run_study()` distributes them over a process pool. Every worker creates its own Gurobi environment (`init_worker()`), and the available threads are split among the workers (Gurobi parameter `Threads`, the number of search workers of `solve_cp_sat()`) so that the cores are not oversubscribed. Results are collected as soon as a run finishes. With `workers=1`, the same runs are executed one after another with the same `Threads` setting, which gives the same results. In both cases, the schedule and `Result` of the last finished run of an instance are written back to the network in `instances`. Under the *spawn* start method (Windows), the workers import this file again, so the study loop below only runs in the main process. With `runs_path`, every run records its trajectory (`trace=True`) and `save_runs()` writes the `Result` of every run to a JSON file.
+"""
 
-  solve_dt_pulse(network)
-  #solve_ddt_pulse(network)
-  #solve_dt_step(network)
-  #solve_ddt_step(network)
-  #solve_flow(network)
+from concurrent.futures import as_completed
+
+FORMULATIONS = {
+  'dt_pulse': solve_dt_pulse,
+  'ddt_pulse': solve_ddt_pulse,
+  'dt_step': solve_dt_step,
+  'ddt_step': solve_ddt_step,
+  'flow': solve_flow,
+}
+if cp_model is not None:
+  FORMULATIONS['cp_sat'] = solve_cp_sat
+
+
+def make_env(threads, params=None):
+  env = gp.Env(empty=True)
+  for param, value in (params or {}).items():
+    env.setParam(param, value)
+  env.setParam('OutputFlag', 0)
+  env.setParam('Threads', threads)
+  env.start()
+  return env
+
+
+def init_worker(threads, params):
+  # the solve() methods use the global environment e
+  global e
+  e = make_env(threads, params)
+
+
+def run_job(network, formulation, options, threads=None):
+  # the solve() methods return (objective value, runtime, gap), the schedule is returned for the network of the caller
+  # CP-SAT does not use the Gurobi environment, it gets the threads of the worker as its number of search workers
+  if formulation == 'cp_sat' and threads is not None:
+    options = dict(options, workers=options.get('workers', threads))
+  result = FORMULATIONS[formulation](network, **options)
+  start = [network.node_dict[i].start for i in network.node_ids]
+  return network.name, formulation, result, network.result, start, network.makespan
+
+
+def save_runs(path, runs):
+  # Result of every run as JSON, including the trajectories
+  data = []
+  for (name, formulation), run in runs.items():
+    if run is not None:
+      data.append(dict(run.to_dict(), instance=name, formulation=formulation))
+  with open(path, 'w') as f:
+    json.dump(data, f, indent=1)
+
+
+def run_study(instances, formulations=tuple(FORMULATIONS), options=None, mip_starts=None, workers=None, threads=None, env_params=None, runs_path=None):
+  # options: {formulation: keyword arguments of its solve() method}, mip_starts: {instance: start times},
+  # runs_path: record the trajectories and save the Result of every run there (save_runs())
+  workers = workers or os.cpu_count()
+  threads = max((threads or os.cpu_count()) // workers, 1)
+  jobs = []
+  for inst, network in instances.items():
+    for formulation in formulations:
+      kwargs = dict((options or {}).get(formulation, {}))
+      if mip_starts is not None and inst in mip_starts:
+        kwargs['mip_start'] = mip_starts[inst]
+      if runs_path is not None:
+        kwargs['trace'] = True
+      jobs.append((network, formulation, kwargs))
+
+  if workers == 1:
+    init_worker(threads, env_params)
+    finished = (run_job(*job, threads) for job in jobs)
+  else:
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(threads, env_params))
+    finished = (future.result() for future in as_completed([pool.submit(run_job, *job, threads) for job in jobs]))
+
+  results, runs = {}, {}
+  for name, formulation, result, run, start, makespan in finished:
+    results[(name, formulation)] = result
+    runs[(name, formulation)] = run
+    # the workers solve copies of the networks, the last finished run is written back as with workers=1
+    network = instances[name]
+    network.result, network.makespan = run, makespan
+    for i in network.node_ids:
+      network.node_dict[i].start = start[i]
+    print("Finished {} with {}: {}".format(name, formulation, result))
+  if workers != 1:
+    pool.shutdown()
+  if runs_path is not None:
+    save_runs(runs_path, runs)
+  return results
+
+
+# the process pools re-import this file under the spawn start method (Windows), the study only runs in the main process
+if __name__ == '__main__':
+  starts = {}
+  for inst in Instances:
+    network = Instances[inst]
+
+    compute_time_windows(network)
+    makespan, starts[inst] = set_heuristic_horizon(network, passes=1000) # shrinks Tmax to the best heuristic makespan + 1
+    report = tighten_time_windows(network)
+    print("Time-window tightening for {}: lower bound {}, {} of {} variables eliminated".format(
+        network.name, report['lower_bound'], report['eliminated'], report['variables_before']))
+
+  results = run_study(Instances,
+                      formulations=['dt_pulse'], # 'ddt_pulse', 'dt_step', 'ddt_step', 'flow'
+                      options={'dt_pulse': {'windowed': True}},
+                      mip_starts=starts,
+                      env_params={'LicenseID': lic})
 
 # write results to results tab
 
@@ -897,6 +2956,76 @@ for inst in Instances:
 
 # nr of instances solved to optimality
 
+"""### Benchmark
+
+`run_benchmark()` solves a fixed set of instances with the MIP formulations (`BENCHMARK_FORMULATIONS`; CP-SAT and the branch-and-bound do not report these phases) and measures where the time goes. For every run it records the wall time of the time window computation, of the model construction (`build`: the rest of the `solve()` call), of `optimize()` and of `extract_solution()`, together with the number of variables, constraints and nonzeros of the model. The records are written to a JSON file. Given the file of an earlier benchmark as `baseline`, `compare_benchmark()` flags every run whose times grew by more than `tolerance` (relative, ignoring differences below `min_seconds`) or whose model grew.
+"""
+
+import contextlib
+import io
+
+BENCHMARK_FORMULATIONS = ('dt_pulse', 'ddt_pulse', 'dt_step', 'ddt_step', 'flow')
+BENCHMARK_TIMES = ('time_windows', 'build', 'optimize', 'extract')
+BENCHMARK_SIZES = ('variables', 'constraints', 'nonzeros')
+
+
+def benchmark_run(network, formulation, options):
+  begin = time.perf_counter()
+  compute_time_windows(network)
+  time_windows = time.perf_counter() - begin
+
+  begin = time.perf_counter()
+  with contextlib.redirect_stdout(io.StringIO()):
+    FORMULATIONS[formulation](network, **options)
+  total = time.perf_counter() - begin
+
+  result = network.result
+  if result.phases is None:
+    raise ValueError("{} does not record the phase times of the run, it cannot be benchmarked".format(formulation))
+  record = {'instance': network.name, 'formulation': formulation, 'options': options,
+            'status': result.status, 'objective': result.objective, 'time_windows': time_windows,
+            'build': total - result.phases['optimize'] - result.phases['extract']}
+  record.update(result.phases)
+  record.update(result.size)
+  return record
+
+
+def run_benchmark(instances, formulations=BENCHMARK_FORMULATIONS, options=None, path=None, baseline=None, tolerance=0.2, min_seconds=0.05):
+  # options: {formulation: keyword arguments of its solve() method}; returns the records and the regressions
+  # only the MIP formulations time optimize() and extract_solution() (Result.phases), CP-SAT and the branch-and-bound do not
+  unsupported = [formulation for formulation in formulations if formulation not in BENCHMARK_FORMULATIONS]
+  if unsupported:
+    raise ValueError("no phase times for {}, run_benchmark() supports {}".format(', '.join(unsupported), ', '.join(BENCHMARK_FORMULATIONS)))
+  records = []
+  for inst, network in instances.items():
+    for formulation in formulations:
+      records.append(benchmark_run(network, formulation, dict((options or {}).get(formulation, {}))))
+  if path is not None:
+    with open(path, 'w') as f:
+      json.dump(records, f, indent=1)
+  regressions = compare_benchmark(records, baseline, tolerance, min_seconds) if baseline is not None else []
+  return records, regressions
+
+
+def compare_benchmark(records, baseline, tolerance=0.2, min_seconds=0.05):
+  # baseline: path of an earlier run_benchmark() file, runs are matched by instance, formulation and options
+  with open(baseline) as f:
+    old = {(r['instance'], r['formulation'], json.dumps(r['options'], sort_keys=True)): r for r in json.load(f)}
+  regressions = []
+  for record in records:
+    before = old.get((record['instance'], record['formulation'], json.dumps(record['options'], sort_keys=True)))
+    if before is None:
+      continue
+    for key in BENCHMARK_TIMES:
+      if record[key] > before[key] * (1 + tolerance) and record[key] - before[key] > min_seconds:
+        regressions.append((record['instance'], record['formulation'], key, before[key], record[key]))
+    for key in BENCHMARK_SIZES:
+      if record[key] > before[key]:
+        regressions.append((record['instance'], record['formulation'], key, before[key], record[key]))
+  for (inst, formulation, key, before, after) in regressions:
+    print("Regression for {} with {}: {} {} -> {}".format(inst, formulation, key, before, after))
+  return regressions
+
 """### 2.3 Comparison
 
 Finally, you should compare the performance of the different MIP formulations by means of a small computational analysis, as you would typically do in a scientific paper.